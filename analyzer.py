@@ -4,37 +4,169 @@ This module processes tweet content to determine sentiment, tone, and rhetorical
 intent using an LLM or local NLP tools. It classifies ideology, detects slurs,
 and recommends a tone for the response.
 
-Primary function: analyze_context(tweet_text: str) -> dict
+Primary functions:
+- :func:`analyze_context` – classify a single tweet with the LLM
+- :func:`classify_batch` – score a poll of tweets with the optional local model
 """
 
 from __future__ import annotations
 
-from typing import Any, Dict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
 import json
 
+import classifier
+import llm
+import prompting
+import singleflight
+import utils
 from utils import load_env, get_env_var
 import openai
-import backoff
 
+_PROMPT_PREFIX = (
+    "Classify the following tweet in JSON with the keys: tone, ideology, "
+    "emotion, contains_slur (true/false), reply_tone. Respond only with "
+    "JSON. Tweet: "
+)
 
-@backoff.on_exception(backoff.expo, openai.OpenAIError, max_tries=3)
-def _chat_completion(client: openai.OpenAI, prompt: str):
-    """Call the OpenAI chat completion API with retries."""
+# Minimum per-field confidence before a local prediction replaces the LLM
+DEFAULT_LOCAL_THRESHOLD = 0.8
 
-    return client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0,
+# Coalesces concurrent analyses of the same (normalised) tweet text
+ANALYSIS_FLIGHTS = singleflight.get_group("analysis")
+
+
+@lru_cache(maxsize=None)
+def _local_classifier(model_dir: str) -> Optional[classifier.LocalClassifier]:
+    """Load (once per process) the local classifier stored in ``model_dir``."""
+
+    return classifier.load_classifier(Path(model_dir))
+
+
+def _log_analysis(tweet_text: str, analysis: Dict[str, Any]) -> None:
+    """Append an LLM analysis to ``ANALYSIS_LOG_FILE`` as training data."""
+
+    log_file = utils.get_env_var("ANALYSIS_LOG_FILE")
+    if not log_file:
+        return
+    try:
+        with Path(log_file).open("a", encoding="utf-8") as fh:
+            fh.write(json.dumps({"text": tweet_text, "analysis": analysis}) + "\n")
+    except Exception:
+        # Logging training data must never break the reply pipeline
+        pass
+
+
+def classify_batch(
+    texts: Sequence[str], threshold: float | None = None
+) -> List[Optional[Dict[str, Any]]]:
+    """Analyze a batch of tweets with the local classifier when configured.
+
+    The local model scores every tweet in one pass. Tweets whose fields all
+    clear ``LOCAL_CLASSIFIER_THRESHOLD`` get a full analysis dict; the rest get
+    ``None`` and should be sent through :func:`analyze_context`. A field the
+    model never learned (for example ``contains_slur`` from a log without a
+    single slur) counts as unconfident at any threshold.
+
+    Parameters
+    ----------
+    texts:
+        Tweet texts from a single poll.
+    threshold:
+        Overrides ``LOCAL_CLASSIFIER_THRESHOLD``; ``0.0`` accepts every
+        complete prediction, which is useful when there is no time left for
+        the LLM.
+
+    Returns
+    -------
+    List[Optional[Dict[str, Any]]]
+        One entry per text, aligned with ``texts``.
+    """
+
+    load_env()
+    model_dir = utils.get_env_var("LOCAL_CLASSIFIER_DIR")
+    model = _local_classifier(model_dir) if model_dir else None
+    if model is None or not texts:
+        return [None] * len(texts)
+
+    if threshold is None:
+        try:
+            threshold = float(
+                utils.get_env_var(
+                    "LOCAL_CLASSIFIER_THRESHOLD", str(DEFAULT_LOCAL_THRESHOLD)
+                )
+            )
+        except ValueError:
+            threshold = DEFAULT_LOCAL_THRESHOLD
+
+    results: List[Optional[Dict[str, Any]]] = []
+    for labels, confidences in model.predict(list(texts)):
+        confident = set(classifier.FIELDS) <= set(labels) and all(
+            conf >= threshold for conf in confidences.values()
+        )
+        results.append(dict(labels) if confident else None)
+    return results
+
+
+def _request_analysis(
+    api_key: str, tweet_text: str, timeout: float | None = None
+) -> Dict[str, Any]:
+    """Ask OpenAI to classify ``tweet_text``; API errors propagate to the caller."""
+
+    # Configure the OpenAI client. The library switched to a client-based
+    # interface in v1.0 but still supports the old global methods. Using the
+    # client keeps compatibility forward-looking. Its built-in retries are
+    # off because _chat_completion retries within the caller's deadline.
+    client = openai.OpenAI(api_key=api_key, max_retries=0)
+
+    # We ask the model to classify the tweet and respond in a compact JSON
+    # format. Keeping the prompt short helps reduce latency and token usage.
+    prompt = prompting.compose(_PROMPT_PREFIX, tweet_text)
+
+    response = llm.chat_completion(
+        client, [{"role": "user", "content": prompt}], temperature=0, timeout=timeout
     )
 
+    # The API returns a list of choices; we take the first message content.
+    content = response.choices[0].message.content
 
-def analyze_context(tweet_text: str) -> Dict[str, Any]:
+    # Attempt to parse the JSON returned by the model. If parsing fails we
+    # fall back to a neutral baseline.
+    analysis = fallback_analysis()
+    try:
+        analysis.update(json.loads(content))
+        _log_analysis(tweet_text, analysis)
+    except Exception:
+        # Basic heuristic if the model didn't return pure JSON.
+        if "slur" in tweet_text.lower():
+            analysis["contains_slur"] = True
+
+    return analysis
+
+
+def fallback_analysis() -> Dict[str, Any]:
+    """Return the neutral analysis used when no classification is available."""
+
+    return {
+        "tone": "neutral",
+        "ideology": "unknown",
+        "emotion": "neutral",
+        "contains_slur": False,
+        "reply_tone": "calm",
+    }
+
+
+def analyze_context(tweet_text: str, timeout: float | None = None) -> Dict[str, Any]:
     """Analyze a tweet and return structured context data.
 
     Parameters
     ----------
     tweet_text:
         The content of the tweet that summoned ReasonBot.
+    timeout:
+        Optional limit, in seconds, for the whole OpenAI request including
+        retries and waiting for a limiter slot.
 
     Returns
     -------
@@ -52,57 +184,18 @@ def analyze_context(tweet_text: str) -> Dict[str, Any]:
             "Missing OPENAI_API_KEY. Returning fallback analysis while we wait "
             "for credentials."
         )
-        return {
-            "tone": "neutral",
-            "ideology": "unknown",
-            "emotion": "neutral",
-            "contains_slur": False,
-            "reply_tone": "calm",
-        }
+        return fallback_analysis()
 
     try:
-        # Configure the OpenAI client. The library switched to a client-based
-        # interface in v1.0 but still supports the old global methods. Using the
-        # client keeps compatibility forward-looking.
-        client = openai.OpenAI(api_key=api_key)
-
-        # We ask the model to classify the tweet and respond in a compact JSON
-        # format. Keeping the prompt short helps reduce latency and token usage.
-        prompt = (
-            "Classify the following tweet in JSON with the keys: tone, ideology, "
-            "emotion, contains_slur (true/false), reply_tone. Respond only with "
-            "JSON. Tweet: "
-            f"{tweet_text}"
+        # Identical mentions handled concurrently share one OpenAI call
+        analysis = dict(
+            ANALYSIS_FLIGHTS.do(
+                utils.normalize_text(tweet_text),
+                lambda: _request_analysis(api_key, tweet_text, timeout),
+            )
         )
-
-        response = _chat_completion(client, prompt)
-
-        # The API returns a list of choices; we take the first message content.
-        content = response.choices[0].message.content
-
-        # Attempt to parse the JSON returned by the model. If parsing fails we
-        # fall back to a neutral baseline.
-        analysis: Dict[str, Any] = {
-            "tone": "neutral",
-            "ideology": "unknown",
-            "emotion": "neutral",
-            "contains_slur": False,
-            "reply_tone": "calm",
-        }
-        try:
-            analysis.update(json.loads(content))
-        except Exception:
-            # Basic heuristic if the model didn't return pure JSON.
-            if "slur" in tweet_text.lower():
-                analysis["contains_slur"] = True
     except Exception as exc:  # broad catch to keep the bot running
         print(f"OpenAI API error: {exc}")
-        analysis = {
-            "tone": "neutral",
-            "ideology": "unknown",
-            "emotion": "neutral",
-            "contains_slur": False,
-            "reply_tone": "calm",
-        }
+        analysis = fallback_analysis()
 
     return analysis
@@ -7,20 +7,29 @@ analyzer and replier modules to generate a strategic response.
 Primary functions:
 - :func:`check_mentions` – fetches recent @mentions
 - :func:`dispatch` – full pipeline to analyze, reply, and avoid duplicates
+- :func:`retry_outbox` – post replies left over from failed attempts
 """
 
 from __future__ import annotations
 
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Set, Tuple
 from pathlib import Path
+import threading
 
 import analyzer
+import concurrency
+import outbox
+import prompting
 import replier
+import singleflight
 
 import tweepy
 import utils
 
+from leases import DEFAULT_LEASE_SECONDS, LeaseTable
 from utils import (
+    Deadline,
     load_env,
     get_env_var,
     is_rate_limited,
@@ -30,6 +39,21 @@ from utils import (
 
 # Local cache of tweets we've replied to
 PROCESSED_FILE = Path("processed_ids.txt")
+# Generated replies waiting to be (re)posted
+OUTBOX_FILE = Path("outbox.json")
+
+# Twitter's write limits are far tighter than OpenAI's, so start and cap lower
+TWITTER_LIMITER = concurrency.get_limiter("twitter", initial=2, max_limit=8)
+
+# Outcomes reported in the run summary: the degradation levels from best to
+# worst, then mentions that failed or that another run had claimed
+LEVELS = ("full", "local_analysis", "deferred", "failed", "leased")
+# Assumed seconds per OpenAI call until the limiter has measured real latency
+DEFAULT_LLM_SECONDS = 5.0
+# Seconds held back from a mention's budget for posting its reply
+POST_SECONDS = 2.0
+# Mentions handled in parallel by ``python bot.py``; the limiters cap the calls
+DEFAULT_WORKERS = 4
 
 
 def check_mentions(count: int = 5) -> List[tweepy.tweet.Tweet]:
@@ -62,7 +86,8 @@ def check_mentions(count: int = 5) -> List[tweepy.tweet.Tweet]:
     client = tweepy.Client(bearer_token=bearer_token)
 
     # Request the most recent mentions for the configured user ID
-    response = client.get_users_mentions(id=user_id, max_results=count)
+    with TWITTER_LIMITER.slot():
+        response = client.get_users_mentions(id=user_id, max_results=count)
     tweets = response.data or []
 
     for tweet in tweets:
@@ -72,12 +97,21 @@ def check_mentions(count: int = 5) -> List[tweepy.tweet.Tweet]:
     return tweets
 
 
-def dispatch(count: int = 5, cooldown: int | None = None) -> None:
+def dispatch(
+    count: int = 5,
+    cooldown: int | None = None,
+    workers: int = 1,
+    deadline: float | None = None,
+) -> None:
     """Process new mentions and post replies.
 
     This high-level dispatcher wires together the analyzer and replier modules.
     It also keeps a simple file-based cache of tweet IDs so we don't reply twice
-    to the same mention across runs.
+    to the same mention across runs. Generated replies are queued in
+    :data:`OUTBOX_FILE` before posting, and a mention only counts as processed
+    once its reply is actually posted. Each mention is leased (see
+    :mod:`leases`) before any LLM work, so overlapping runs split the poll
+    instead of replying twice.
 
     Parameters
     ----------
@@ -85,11 +119,21 @@ def dispatch(count: int = 5, cooldown: int | None = None) -> None:
         Number of @mentions to fetch and potentially reply to.
     cooldown:
         If provided, minimum seconds between successful dispatch runs.
+    workers:
+        Mentions processed in parallel. The OpenAI and Twitter limiters in
+        :mod:`concurrency` decide how many calls are actually in flight, so this
+        is an upper bound rather than a tuned setting.
+    deadline:
+        Optional budget in seconds for the whole run. As it runs out, mentions
+        are handled with fewer OpenAI calls and finally deferred to the next
+        run rather than overrunning into it (see :func:`_choose_level`).
     """
 
     # Ensure environment variables are loaded
     load_env()
 
+    budget = Deadline(deadline) if deadline is not None else None
+
     if cooldown and is_rate_limited(PROCESSED_FILE.with_suffix(".lock"), cooldown):
         print("Cooldown active. Skipping dispatch.")
         return
@@ -98,9 +142,208 @@ def dispatch(count: int = 5, cooldown: int | None = None) -> None:
 
     tweets = check_mentions(count)
 
-    if not tweets:
+    if not tweets and not outbox.due_replies(OUTBOX_FILE):
+        return
+
+    client = _posting_client()
+    if client is None:
         return
 
+    # Claims outlive the run's own deadline so a slow run isn't overtaken
+    leases = LeaseTable(
+        PROCESSED_FILE.with_suffix(".leases"), max(DEFAULT_LEASE_SECONDS, deadline or 0)
+    )
+
+    # Replies generated by earlier runs go out first; no LLM work needed
+    retry_outbox(client, processed, budget, leases)
+
+    # A cheap first pass; _handle_mention re-checks once it holds the lease
+    queued = outbox.load_outbox(OUTBOX_FILE)
+    pending = [
+        tweet
+        for tweet in tweets
+        if str(tweet.id) not in processed and str(tweet.id) not in queued
+    ]
+
+    # Score the whole poll locally in one pass; None means "ask the LLM"
+    local_contexts = analyzer.classify_batch([tweet.text for tweet in pending])
+
+    collapsed_before = _collapsed_calls()
+    prompts_before = prompting.stats()
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        levels = list(
+            pool.map(
+                lambda item: _handle_mention(
+                    client, item[0], item[1], processed, budget, leases
+                ),
+                zip(pending, local_contexts),
+            )
+        )
+
+    collapsed = _collapsed_calls() - collapsed_before
+    if collapsed:
+        print(f"Coalesced {collapsed} duplicate OpenAI calls")
+
+    _report_compaction(prompts_before)
+
+    if pending:
+        summary = ", ".join(f"{levels.count(level)} {level}" for level in LEVELS)
+        print(f"Dispatch summary: {summary}")
+        _report_concurrency()
+
+    duplicates = levels.count("leased")
+    if duplicates:
+        print(f"Skipped {duplicates} mentions already claimed by another run")
+
+
+def _choose_level(budget: Deadline | None, has_local_context: bool) -> str:
+    """Pick how much work a mention can afford with the time left.
+
+    ``full`` runs every stage. ``local_analysis`` skips the analyzer's OpenAI
+    call and relies on the local classifier (or a neutral analysis).
+    ``deferred`` leaves the mention unprocessed for the next run.
+    """
+
+    if budget is None:
+        return "full"
+
+    llm_seconds = _llm_seconds()
+    remaining = budget.remaining()
+    analysis_cost = 0.0 if has_local_context else llm_seconds
+    if remaining >= analysis_cost + llm_seconds + POST_SECONDS:
+        return "full"
+    if remaining >= llm_seconds + POST_SECONDS:
+        return "local_analysis"
+    return "deferred"
+
+
+def _llm_seconds() -> float:
+    """Expected duration of one OpenAI call, from the limiter's measurements."""
+
+    return concurrency.get_limiter("openai").stats()["latency"] or DEFAULT_LLM_SECONDS
+
+
+def _report_compaction(before: Dict[str, int]) -> None:
+    """Print the estimated tokens prompt compaction saved during this run."""
+
+    after = prompting.stats()
+    # Only prompts actually built count; deferred, leased and library-served
+    # mentions build none
+    prompts = after["prompts"] - before["prompts"]
+    saved = (after["tokens_before"] - before["tokens_before"]) - (
+        after["tokens_after"] - before["tokens_after"]
+    )
+    if saved > 0 and prompts:
+        print(
+            f"Prompt compaction saved ~{saved} tokens "
+            f"(~{saved / prompts:.1f} per prompt)"
+        )
+
+
+def _report_concurrency() -> None:
+    """Print each limiter's current limit and what it saw this process."""
+
+    for name, stats in sorted(concurrency.snapshot().items()):
+        print(
+            f"{name} limit {stats['limit']}: {stats['successes']} ok, "
+            f"{stats['throttled']} throttled, {stats['spikes']} slow, "
+            f"{stats['errors']} errors"
+        )
+
+
+def _collapsed_calls() -> int:
+    """Total OpenAI calls saved so far by single-flight coalescing."""
+
+    return sum(stats["collapsed"] for stats in singleflight.snapshot().values())
+
+
+def _handle_mention(
+    client: tweepy.Client,
+    tweet: tweepy.tweet.Tweet,
+    local_context: Dict[str, Any] | None,
+    processed: Set[str],
+    budget: Deadline | None = None,
+    leases: LeaseTable | None = None,
+) -> str:
+    """Analyze, reply to and post a single new mention.
+
+    Returns the degradation level the mention was handled at, ``"failed"``
+    if no reply could be generated, or ``"leased"`` if another run had already
+    claimed it.
+    """
+
+    level = _choose_level(budget, local_context is not None)
+    if level == "deferred":
+        return level
+
+    if leases is not None and not leases.claim(str(tweet.id)):
+        return "leased"
+
+    if str(tweet.id) in outbox.load_outbox(OUTBOX_FILE):
+        # Another run queued a reply after our snapshot; its retry will post it
+        if leases is not None:
+            leases.release(str(tweet.id))
+        return "leased"
+
+    try:
+        context = local_context
+        if context is None and level == "local_analysis":
+            guess = analyzer.classify_batch([tweet.text], threshold=0.0)[0]
+            context = guess or analyzer.fallback_analysis()
+        if context is None:
+            # Keep enough of the budget back for the reply call to follow
+            context = analyzer.analyze_context(
+                tweet.text, timeout=_stage_timeout(budget, later_calls=1)
+            )
+
+        # Analysis may have used up the budget; re-check before the reply call
+        if budget is not None and budget.remaining() < _llm_seconds() + POST_SECONDS:
+            reply_text = None
+        else:
+            reply_text = replier.generate_reply(
+                context, tweet.text, timeout=_stage_timeout(budget)
+            )
+    except Exception as exc:  # keep loop going even if one tweet fails
+        print(f"Error replying to {tweet.id}: {exc}")
+        if leases is not None:
+            leases.release(str(tweet.id))
+        return "failed"
+
+    if reply_text is None:
+        # Out of time: hand the mention to the next run untouched
+        if leases is not None:
+            leases.release(str(tweet.id))
+        return "deferred"
+
+    if reply_text in replier.FALLBACK_REPLIES:
+        # Never queue or post a placeholder; leave the mention for a later run
+        print(f"No reply generated for {tweet.id}; leaving it for the next run")
+        if leases is not None:
+            leases.release(str(tweet.id))
+        return "failed"
+
+    # Persist before posting so a failed post can be retried for free
+    outbox.queue_reply(OUTBOX_FILE, str(tweet.id), reply_text)
+    _post_reply(client, tweet.id, reply_text, processed, leases)
+    return level
+
+
+def _stage_timeout(budget: Deadline | None, later_calls: int = 0) -> float | None:
+    """Time an OpenAI stage may take.
+
+    :data:`POST_SECONDS` is kept back for posting, plus the expected duration
+    of each of the ``later_calls`` OpenAI calls still to come for the mention.
+    """
+
+    if budget is None:
+        return None
+    return budget.timeout(POST_SECONDS + later_calls * _llm_seconds())
+
+
+def _posting_client() -> tweepy.Client | None:
+    """Return a Twitter client authorised to post, or ``None`` if unconfigured."""
+
     # Collect credentials required for posting a reply
     creds = {
         "bearer_token": utils.get_env_var("TWITTER_BEARER_TOKEN"),
@@ -112,23 +355,159 @@ def dispatch(count: int = 5, cooldown: int | None = None) -> None:
 
     if not all(creds.values()):
         print("Missing Twitter credentials for posting replies.")
-        return
+        return None
 
-    client = tweepy.Client(**creds)
+    return tweepy.Client(**creds)
 
-    for tweet in tweets:
-        if str(tweet.id) in processed:
+
+def _post_reply(
+    client: tweepy.Client,
+    tweet_id: int | str,
+    reply_text: str,
+    processed: Set[str],
+    leases: LeaseTable | None = None,
+) -> bool:
+    """Post a queued reply and mark the mention processed once it is settled.
+
+    On failure the lease is released so whichever run retries the outbox next
+    can claim it. If the outbox gives up on the reply, the mention is marked
+    processed instead so no later run pays to regenerate it. Nothing is posted
+    if the lease can't be renewed first: a run slow enough to lose its lease
+    leaves the mention to the run that took it.
+    """
+
+    if leases is not None and not leases.renew(str(tweet_id)):
+        print(f"Lease on {tweet_id} expired; leaving it to the run that took it over")
+        return False
+
+    try:
+        with TWITTER_LIMITER.slot():
+            client.create_tweet(text=reply_text, in_reply_to_tweet_id=tweet_id)
+    except Exception as exc:  # keep the reply queued for a later retry
+        print(f"Error replying to {tweet_id}: {exc}")
+        if outbox.record_failure(OUTBOX_FILE, str(tweet_id), exc):
+            _mark_processed(str(tweet_id), processed, leases)
+        elif leases is not None:
+            leases.release(str(tweet_id))
+        return False
+
+    _mark_processed(str(tweet_id), processed, leases)
+    return True
+
+
+def _mark_processed(
+    tweet_id: str, processed: Set[str], leases: LeaseTable | None
+) -> None:
+    """Record ``tweet_id`` as handled so no run replies to it again."""
+
+    processed.add(tweet_id)
+    save_processed_id(PROCESSED_FILE, tweet_id)
+    outbox.remove_reply(OUTBOX_FILE, tweet_id)
+    if leases is not None:
+        leases.complete(tweet_id)
+
+
+def retry_outbox(
+    client: tweepy.Client,
+    processed: Set[str] | None = None,
+    budget: Deadline | None = None,
+    leases: LeaseTable | None = None,
+) -> int:
+    """Post every outbox reply whose retry time has passed.
+
+    Parameters
+    ----------
+    client:
+        Twitter client authorised to post.
+    processed:
+        Already-handled tweet IDs; loaded from :data:`PROCESSED_FILE` if omitted.
+    budget:
+        Optional run deadline; remaining replies wait for a later run once it
+        gets too close.
+    leases:
+        Lease table shared with other runs; replies another run is already
+        posting are skipped. A fresh table is opened if omitted.
+
+    Returns
+    -------
+    int
+        Number of replies posted.
+    """
+
+    if processed is None:
+        processed = load_processed_ids(PROCESSED_FILE)
+    if leases is None:
+        leases = LeaseTable(PROCESSED_FILE.with_suffix(".leases"))
+
+    posted = 0
+    skipped = 0
+    for tweet_id, reply_text in outbox.due_replies(OUTBOX_FILE).items():
+        if budget is not None and budget.remaining() < POST_SECONDS:
+            break
+        if tweet_id in processed:
+            # Posted by an earlier run that crashed before clearing the outbox
+            outbox.remove_reply(OUTBOX_FILE, tweet_id)
+            continue
+        if not leases.claim(tweet_id):
+            skipped += 1
             continue
+        if _post_reply(client, tweet_id, reply_text, processed, leases):
+            posted += 1
 
-        try:
-            context = analyzer.analyze_context(tweet.text)
-            reply_text = replier.generate_reply(context, tweet.text)
-            client.create_tweet(text=reply_text, in_reply_to_tweet_id=tweet.id)
-            processed.add(str(tweet.id))
-            save_processed_id(PROCESSED_FILE, str(tweet.id))
-        except Exception as exc:  # keep loop going even if one tweet fails
-            print(f"Error replying to {tweet.id}: {exc}")
+    if skipped:
+        print(f"Skipped {skipped} outbox replies already claimed by another run")
+    return posted
+
+
+def retry_loop(interval: float = 60.0, stop: threading.Event | None = None) -> None:
+    """Keep draining the outbox every ``interval`` seconds until ``stop`` is set.
+
+    Useful as a background thread alongside a long-running process when
+    Twitter is throttling writes.
+    """
+
+    load_env()
+    client = _posting_client()
+    if client is None:
+        return
+
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        retry_outbox(client)
+        stop.wait(interval)
+
+
+def _run_settings() -> Tuple[float | None, int]:
+    """Read ``DISPATCH_DEADLINE`` and ``DISPATCH_WORKERS`` for ``python bot.py``.
+
+    Invalid values are reported and replaced by the defaults: no deadline and
+    :data:`DEFAULT_WORKERS` workers.
+    """
+
+    run_deadline = get_env_var("DISPATCH_DEADLINE")
+    try:
+        run_deadline = float(run_deadline) if run_deadline else None
+    except ValueError:
+        print(
+            "DISPATCH_DEADLINE must be a number of seconds; running without a deadline."
+        )
+        run_deadline = None
+
+    workers = get_env_var("DISPATCH_WORKERS")
+    try:
+        workers = int(workers) if workers else DEFAULT_WORKERS
+        if workers < 1:
+            raise ValueError(workers)
+    except ValueError:
+        print(
+            f"DISPATCH_WORKERS must be a positive whole number; using {DEFAULT_WORKERS}."
+        )
+        workers = DEFAULT_WORKERS
+
+    return run_deadline, workers
 
 
 if __name__ == "__main__":
-    dispatch()
+    load_env()
+    run_deadline, run_workers = _run_settings()
+    dispatch(workers=run_workers, deadline=run_deadline)
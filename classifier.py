@@ -0,0 +1,287 @@
+"""ReasonBot Local Classifier
+
+An optional, dependency-light stand-in for the analyzer's LLM call. Tweets are
+turned into hashed bag-of-words and character n-gram features and scored with a
+linear model per analysis field, so a whole poll of mentions is classified with
+one matrix multiply per field. Each prediction carries a confidence; callers
+fall back to the LLM whenever a field is not confident enough.
+
+A field needs at least two distinct labels in the training log to be learned.
+With a single label its softmax has one column and would report every
+prediction at confidence 1.0, so such fields are left out and callers treat
+them as unconfident.
+
+The model is trained from the labels the analyzer logs for its own LLM calls
+(see ``ANALYSIS_LOG_FILE``) and stored as one ``.npy`` weight matrix per field
+plus a ``labels.json`` file. Weights are memory-mapped on load so startup stays
+fast regardless of model size.
+
+Primary functions:
+- :func:`train` – fit a :class:`LocalClassifier` from logged analyses
+- :func:`load_classifier` – open a saved model directory
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import sys
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+try:  # NumPy is optional; without it the local path is simply disabled
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None
+
+__all__ = [
+    "FIELDS",
+    "LocalClassifier",
+    "featurize",
+    "load_training_log",
+    "train",
+    "load_classifier",
+]
+
+# Analysis keys predicted locally. Together they form a complete analysis dict.
+FIELDS = ("tone", "ideology", "emotion", "contains_slur", "reply_tone")
+
+N_FEATURES = 2**14
+NGRAM = 3
+
+_WORD_RE = re.compile(r"[\w']+")
+
+
+def _hashed_features(text: str, n_features: int) -> Tuple[Any, Any]:
+    """Return ``(indices, values)`` for the hashed features of ``text``."""
+
+    lowered = text.lower()
+    tokens = [f"w:{word}" for word in _WORD_RE.findall(lowered)]
+    padded = f" {' '.join(lowered.split())} "
+    tokens.extend(f"c:{padded[i:i + NGRAM]}" for i in range(len(padded) - NGRAM + 1))
+
+    counts: Dict[int, float] = {}
+    for token in tokens:
+        bucket = zlib.crc32(token.encode("utf-8")) % n_features
+        counts[bucket] = counts.get(bucket, 0.0) + 1.0
+
+    indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+    norm = float(np.linalg.norm(values))
+    if norm:
+        values /= norm
+    return indices, values
+
+
+def _to_matrix(rows: Sequence[Tuple[Any, Any]], n_features: int):
+    """Stack sparse ``(indices, values)`` rows into a dense feature matrix."""
+
+    matrix = np.zeros((len(rows), n_features), dtype=np.float32)
+    for i, (indices, values) in enumerate(rows):
+        matrix[i, indices] = values
+    return matrix
+
+
+def featurize(texts: Sequence[str], n_features: int = N_FEATURES):
+    """Return an L2-normalised hashed feature matrix for ``texts``."""
+
+    return _to_matrix([_hashed_features(t, n_features) for t in texts], n_features)
+
+
+def _softmax(scores):
+    scores = scores - scores.max(axis=1, keepdims=True)
+    exp = np.exp(scores)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class LocalClassifier:
+    """Linear per-field classifier over hashed text features.
+
+    Parameters
+    ----------
+    weights:
+        Mapping of field name to a ``(n_features + 1, n_labels)`` array. The
+        last row holds the bias.
+    labels:
+        Mapping of field name to the label values, in column order.
+
+    Raises
+    ------
+    ValueError
+        If ``weights`` is empty.
+    """
+
+    def __init__(self, weights: Dict[str, Any], labels: Dict[str, List[Any]]):
+        if not weights:
+            raise ValueError("A local classifier needs at least one trained field")
+        self.weights = weights
+        self.labels = labels
+        first = next(iter(weights.values()))
+        self.n_features = first.shape[0] - 1
+
+    def predict(
+        self, texts: Sequence[str]
+    ) -> List[Tuple[Dict[str, Any], Dict[str, float]]]:
+        """Classify ``texts`` in one batch.
+
+        Returns
+        -------
+        List[Tuple[Dict[str, Any], Dict[str, float]]]
+            For each text, the predicted label per field and the matching
+            per-field confidence (the softmax probability of that label).
+            Fields with fewer than two labels (from models saved by older
+            versions) are omitted.
+        """
+
+        if not texts:
+            return []
+
+        features = featurize(texts, self.n_features)
+        results: List[Tuple[Dict[str, Any], Dict[str, float]]] = [
+            ({}, {}) for _ in texts
+        ]
+        for field, weight in self.weights.items():
+            if len(self.labels[field]) < 2:
+                continue
+            probs = _softmax(features @ weight[:-1] + weight[-1])
+            best = probs.argmax(axis=1)
+            for i, column in enumerate(best):
+                results[i][0][field] = self.labels[field][column]
+                results[i][1][field] = float(probs[i, column])
+        return results
+
+    def save(self, directory: Path) -> None:
+        """Write the model to ``directory`` as ``.npy`` files and labels."""
+
+        directory.mkdir(parents=True, exist_ok=True)
+        for field, weight in self.weights.items():
+            np.save(directory / f"{field}.npy", np.asarray(weight, dtype=np.float32))
+        (directory / "labels.json").write_text(json.dumps(self.labels))
+
+
+def load_classifier(directory: Path) -> LocalClassifier | None:
+    """Memory-map a saved model from ``directory``.
+
+    Returns ``None`` when NumPy is unavailable or the model cannot be read so
+    callers can quietly fall back to the LLM.
+    """
+
+    if np is None:
+        return None
+    try:
+        labels = json.loads((directory / "labels.json").read_text())
+        weights = {
+            field: np.load(directory / f"{field}.npy", mmap_mode="r")
+            for field in labels
+        }
+    except Exception as exc:
+        print(f"Could not load local classifier from {directory}: {exc}")
+        return None
+    if not weights:
+        return None
+    return LocalClassifier(weights, labels)
+
+
+def load_training_log(path: Path) -> List[Tuple[str, Dict[str, Any]]]:
+    """Read ``(text, analysis)`` pairs from an analyzer JSONL log."""
+
+    records = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+            records.append((entry["text"], entry["analysis"]))
+        except Exception:
+            # Skip partial or malformed lines rather than abort training
+            continue
+    return records
+
+
+def train(
+    records: Iterable[Tuple[str, Dict[str, Any]]],
+    n_features: int = N_FEATURES,
+    epochs: int = 30,
+    learning_rate: float = 1.0,
+    l2: float = 1e-4,
+    batch_size: int = 256,
+) -> LocalClassifier:
+    """Fit a softmax-regression model per field with mini-batch SGD.
+
+    Parameters
+    ----------
+    records:
+        ``(tweet_text, analysis)`` pairs, typically from
+        :func:`load_training_log`. Fields missing from an analysis are ignored
+        for that record.
+    n_features:
+        Size of the hashed feature space.
+    epochs, learning_rate, l2, batch_size:
+        Optimiser settings.
+
+    Raises
+    ------
+    ValueError
+        If no field has at least two distinct labels in ``records``.
+    """
+
+    records = list(records)
+    rows = [_hashed_features(text, n_features) for text, _ in records]
+    rng = np.random.default_rng(0)
+
+    weights: Dict[str, Any] = {}
+    labels: Dict[str, List[Any]] = {}
+    for field in FIELDS:
+        samples = [
+            (i, analysis[field])
+            for i, (_, analysis) in enumerate(records)
+            if field in analysis
+        ]
+        if not samples:
+            continue
+
+        field_labels: List[Any] = []
+        for _, value in samples:
+            if value not in field_labels:
+                field_labels.append(value)
+        if len(field_labels) < 2:
+            print(f"Skipping {field}: the log only has the label {field_labels[0]!r}")
+            continue
+        targets = np.array([field_labels.index(v) for _, v in samples])
+        row_ids = np.array([i for i, _ in samples])
+
+        weight = np.zeros((n_features + 1, len(field_labels)), dtype=np.float32)
+        for _ in range(epochs):
+            order = rng.permutation(len(samples))
+            for start in range(0, len(order), batch_size):
+                stop = start + batch_size
+                batch = order[start:stop]
+                x = _to_matrix([rows[row_ids[b]] for b in batch], n_features)
+                probs = _softmax(x @ weight[:-1] + weight[-1])
+                probs[np.arange(len(batch)), targets[batch]] -= 1.0
+                probs /= len(batch)
+                weight[:-1] -= learning_rate * (x.T @ probs + l2 * weight[:-1])
+                weight[-1] -= learning_rate * probs.sum(axis=0)
+
+        weights[field] = weight
+        labels[field] = field_labels
+
+    if not weights:
+        raise ValueError(
+            f"No field has two distinct labels in {len(records)} training records"
+        )
+    return LocalClassifier(weights, labels)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python classifier.py <analysis_log.jsonl> <model_dir>")
+        sys.exit(1)
+    try:
+        model = train(load_training_log(Path(sys.argv[1])))
+    except ValueError as exc:
+        print(f"Cannot train a local classifier: {exc}")
+        sys.exit(1)
+    model.save(Path(sys.argv[2]))
+    print(f"Saved local classifier with fields: {', '.join(model.labels)}")
@@ -0,0 +1,267 @@
+"""ReasonBot Adaptive Concurrency
+
+An AIMD (additive-increase, multiplicative-decrease) limiter for outbound API
+calls. While calls succeed at normal latency the allowed number of in-flight
+requests grows by roughly one per "round" of completions; a 429 or a latency
+spike cuts it sharply. This keeps us near the provider's real capacity instead
+of guessing a fixed parallelism and letting ``backoff`` amplify 429 storms.
+
+Limiters are shared per service through :func:`get_limiter` and work from both
+threads (``with limiter.slot():``) and asyncio (``async with
+limiter.async_slot():``).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable, Dict, List, TypeVar
+
+__all__ = [
+    "AdaptiveLimiter",
+    "get_limiter",
+    "snapshot",
+    "is_rate_limit_error",
+]
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """Return ``True`` if ``exc`` represents an HTTP 429 from OpenAI or Twitter."""
+
+    if getattr(exc, "status_code", None) == 429:
+        return True
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None) == 429
+
+
+class AdaptiveLimiter:
+    """Thread- and asyncio-safe AIMD concurrency limiter.
+
+    Parameters
+    ----------
+    name:
+        Label used in logs and :func:`snapshot`.
+    initial, min_limit, max_limit:
+        Starting, lowest and highest allowed number of in-flight calls.
+    decrease:
+        Factor applied to the limit on a 429 or latency spike.
+    spike_factor:
+        A call slower than ``spike_factor`` times the smoothed latency counts
+        as a spike.
+    cooldown:
+        Minimum seconds between two decreases, so one burst of failures from
+        the same round doesn't collapse the limit repeatedly.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        decrease: float = 0.5,
+        spike_factor: float = 3.0,
+        cooldown: float = 1.0,
+    ) -> None:
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease = decrease
+        self.spike_factor = spike_factor
+        self.cooldown = cooldown
+
+        self._limit = float(initial)
+        self._in_flight = 0
+        self._latency: float | None = None
+        self._last_decrease = float("-inf")
+        self._counts = {"successes": 0, "errors": 0, "throttled": 0, "spikes": 0}
+
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._async_waiters: List[asyncio.Future] = []
+
+    @property
+    def limit(self) -> int:
+        """Current number of calls allowed in flight."""
+
+        return int(self._limit)
+
+    # -- acquisition -----------------------------------------------------
+
+    def _try_acquire(self) -> bool:
+        if self._in_flight < int(self._limit):
+            self._in_flight += 1
+            return True
+        return False
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._wake()
+
+    def _wake(self) -> None:
+        """Notify waiters if capacity is free. Caller must hold the lock."""
+
+        free = int(self._limit) - self._in_flight
+        if free <= 0:
+            return
+        self._available.notify(free)
+        while free > 0 and self._async_waiters:
+            future = self._async_waiters.pop(0)
+            if not future.done():
+                future.get_loop().call_soon_threadsafe(_resolve, future)
+                free -= 1
+
+    @contextmanager
+    def slot(self, timeout: float | None = None):
+        """Hold one in-flight slot for the duration of a blocking call.
+
+        Raises :class:`TimeoutError` if no slot frees up within ``timeout``
+        seconds, so callers working to a deadline never wait past it.
+        """
+
+        with self._lock:
+            if not self._available.wait_for(self._try_acquire, timeout):
+                raise TimeoutError(f"No {self.name} slot free within {timeout:.1f}s")
+
+        start = time.monotonic()
+        try:
+            yield
+        except BaseException as exc:
+            self._finish(start, exc)
+            raise
+        self._finish(start, None)
+
+    @asynccontextmanager
+    async def async_slot(self):
+        """Hold one in-flight slot for the duration of an awaited call."""
+
+        while True:
+            with self._lock:
+                if self._try_acquire():
+                    break
+                future = asyncio.get_running_loop().create_future()
+                self._async_waiters.append(future)
+            try:
+                await future
+            except asyncio.CancelledError:
+                # _wake may already have counted this waiter as served; pass the
+                # wakeup on so a free slot isn't left with nobody to take it
+                with self._lock:
+                    if future in self._async_waiters:
+                        self._async_waiters.remove(future)
+                    self._wake()
+                raise
+
+        start = time.monotonic()
+        try:
+            yield
+        except BaseException as exc:
+            self._finish(start, exc)
+            raise
+        self._finish(start, None)
+
+    def _finish(self, start: float, exc: BaseException | None) -> None:
+        self._record(time.monotonic() - start, exc)
+        self._release()
+
+    def wrap(self, func: F) -> F:
+        """Decorator running ``func`` (sync or async) inside a slot."""
+
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                async with self.async_slot():
+                    return await func(*args, **kwargs)
+
+            return async_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.slot():
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    # -- adjustment ------------------------------------------------------
+
+    def _record(self, latency: float, exc: BaseException | None) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if exc is not None and is_rate_limit_error(exc):
+                self._counts["throttled"] += 1
+                self._cut(now, "429")
+                return
+            if exc is not None:
+                # Non-throttle errors say nothing about capacity; just don't grow
+                self._counts["errors"] += 1
+                return
+
+            self._counts["successes"] += 1
+            baseline = self._latency
+            self._latency = (
+                latency if baseline is None else 0.8 * baseline + 0.2 * latency
+            )
+            if baseline is not None and latency > baseline * self.spike_factor:
+                self._counts["spikes"] += 1
+                self._cut(now, f"latency {latency:.2f}s")
+                return
+
+            # Additive increase: about +1 once a full limit's worth succeeds
+            old = self.limit
+            self._limit = min(self._limit + 1.0 / self._limit, float(self.max_limit))
+            if self.limit != old:
+                print(f"{self.name} concurrency limit {old} -> {self.limit} (healthy)")
+            self._wake()
+
+    def _cut(self, now: float, reason: str) -> None:
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        old = self.limit
+        self._limit = max(self._limit * self.decrease, float(self.min_limit))
+        if self.limit != old:
+            print(f"{self.name} concurrency limit {old} -> {self.limit} ({reason})")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the current limit, in-flight count and outcome counters."""
+
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "in_flight": self._in_flight,
+                "latency": self._latency,
+                **self._counts,
+            }
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+_LIMITERS: Dict[str, AdaptiveLimiter] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_limiter(name: str, **kwargs: Any) -> AdaptiveLimiter:
+    """Return the shared limiter for ``name``, creating it with ``kwargs``."""
+
+    with _REGISTRY_LOCK:
+        if name not in _LIMITERS:
+            _LIMITERS[name] = AdaptiveLimiter(name, **kwargs)
+        return _LIMITERS[name]
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    """Return :meth:`AdaptiveLimiter.stats` for every shared limiter."""
+
+    with _REGISTRY_LOCK:
+        limiters = list(_LIMITERS.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
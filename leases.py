@@ -0,0 +1,132 @@
+"""ReasonBot Mention Leases
+
+Overlapping ``dispatch`` runs (a slow cron tick, a manual run, a restarted
+container) each read ``processed_ids.txt`` before the other writes to it. A
+lease table shared through SQLite lets a run atomically claim a mention ID
+before spending LLM calls on it, so overlapping runs split the work instead of
+doing it twice.
+
+Lease lifecycle:
+
+- :meth:`LeaseTable.claim` – take an unclaimed or expired lease (atomic upsert)
+- :meth:`LeaseTable.renew` – extend a lease this run still holds, right before
+  posting, so a slow run learns if another run has taken the mention over
+- :meth:`LeaseTable.complete` – the reply was posted; the row is kept for a day
+  so a run holding a stale view of ``processed_ids.txt`` can't reclaim it
+- :meth:`LeaseTable.release` – the work failed or was deferred; free it now
+
+A run that crashes never releases its leases; they expire after ``ttl``
+seconds and the next run picks the mentions up.
+"""
+
+from __future__ import annotations
+
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Tuple
+
+__all__ = ["LeaseTable", "DEFAULT_LEASE_SECONDS"]
+
+# How long a claim stays valid if its run never completes or releases it
+DEFAULT_LEASE_SECONDS = 600.0
+# How long completed claims are kept before being pruned
+DONE_RETENTION = 86400.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    tweet_id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires REAL NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+
+class LeaseTable:
+    """SQLite-backed mention leases owned by a single dispatch run.
+
+    Parameters
+    ----------
+    path:
+        SQLite database shared by every run on this machine.
+    ttl:
+        Seconds a claim lasts before another run may take it over.
+    """
+
+    def __init__(self, path: Path, ttl: float = DEFAULT_LEASE_SECONDS) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._execute(_SCHEMA)
+        self._execute(
+            "DELETE FROM leases WHERE done = 1 AND expires < ?",
+            (time.time() - DONE_RETENTION,),
+        )
+
+    def _execute(self, sql: str, params: Tuple[Any, ...] = ()) -> int:
+        """Run one statement in its own transaction and return the row count.
+
+        A connection per call keeps the table usable from worker threads.
+        """
+
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                return conn.execute(sql, params).rowcount
+        finally:
+            conn.close()
+
+    def claim(self, tweet_id: str) -> bool:
+        """Atomically lease ``tweet_id`` for this run.
+
+        Returns ``False`` if another run holds an unexpired lease or has
+        already completed the mention.
+        """
+
+        now = time.time()
+        changed = self._execute(
+            """
+            INSERT INTO leases (tweet_id, owner, expires, done)
+            VALUES (?, ?, ?, 0)
+            ON CONFLICT (tweet_id) DO UPDATE
+            SET owner = excluded.owner, expires = excluded.expires
+            WHERE leases.done = 0
+              AND (leases.expires < ? OR leases.owner = excluded.owner)
+            """,
+            (tweet_id, self.owner, now + self.ttl, now),
+        )
+        return changed == 1
+
+    def renew(self, tweet_id: str) -> bool:
+        """Extend this run's lease on ``tweet_id`` by another ``ttl`` seconds.
+
+        Unlike :meth:`claim` this never takes a lease over. Returns ``False``
+        if the lease expired and another run claimed the mention, or if the
+        mention is already done.
+        """
+
+        changed = self._execute(
+            "UPDATE leases SET expires = ? WHERE tweet_id = ? AND owner = ? AND done = 0",
+            (time.time() + self.ttl, tweet_id, self.owner),
+        )
+        return changed == 1
+
+    def complete(self, tweet_id: str) -> None:
+        """Mark ``tweet_id`` as handled so no other run reclaims it."""
+
+        self._execute(
+            "UPDATE leases SET done = 1, expires = ? WHERE tweet_id = ? AND owner = ?",
+            (time.time(), tweet_id, self.owner),
+        )
+
+    def release(self, tweet_id: str) -> None:
+        """Give up this run's lease on ``tweet_id`` so another run may take it."""
+
+        self._execute(
+            "DELETE FROM leases WHERE tweet_id = ? AND owner = ? AND done = 0",
+            (tweet_id, self.owner),
+        )
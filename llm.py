@@ -0,0 +1,59 @@
+"""ReasonBot OpenAI Calls
+
+The one place ReasonBot talks to the OpenAI chat API. The analyzer and the
+replier differ only in the messages and temperature they send; retries, the
+shared ``openai`` concurrency limiter and deadline handling live here so the
+two can't drift apart.
+
+Primary function: chat_completion(client, messages, temperature, timeout)
+"""
+
+from __future__ import annotations
+
+from typing import Dict, List
+
+import backoff
+import openai
+
+import concurrency
+from utils import Deadline
+
+__all__ = ["MODEL", "OPENAI_LIMITER", "chat_completion"]
+
+MODEL = "gpt-3.5-turbo"
+
+# Shared by the analyzer and the replier: both draw on the same OpenAI quota
+OPENAI_LIMITER = concurrency.get_limiter("openai")
+
+
+def chat_completion(
+    client: openai.OpenAI,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    timeout: float | None = None,
+):
+    """Call the OpenAI chat completion API with retries.
+
+    Each attempt holds a slot in :data:`OPENAI_LIMITER` so the number of
+    in-flight requests adapts to how the API is coping. ``timeout`` bounds the
+    whole call: the wait for a slot, every attempt and the backoff between them.
+    Build ``client`` with ``max_retries=0`` so its own retries don't add to it.
+    """
+
+    deadline = Deadline(timeout) if timeout is not None else None
+
+    @backoff.on_exception(
+        backoff.expo, openai.OpenAIError, max_tries=3, max_time=timeout
+    )
+    def attempt():
+        if deadline is not None and deadline.expired():
+            raise TimeoutError("Deadline reached before calling OpenAI")
+        with OPENAI_LIMITER.slot(timeout=Deadline.left(deadline)):
+            # Omit ``timeout`` without a deadline: None would disable the
+            # client's default request timeout
+            extra = {} if deadline is None else {"timeout": deadline.remaining()}
+            return client.chat.completions.create(
+                model=MODEL, messages=messages, temperature=temperature, **extra
+            )
+
+    return attempt()
@@ -0,0 +1,173 @@
+"""ReasonBot Reply Outbox
+
+Generated replies are written here before they are posted so a failed
+``create_tweet`` call (429 throttling, transient 5xx) doesn't throw away the
+analyzer and replier work. Entries are retried on later runs with
+rate-limit-aware backoff and removed once the post succeeds.
+
+The outbox is a small JSON file mapping tweet IDs to entries of the form
+``{"text": str, "attempts": int, "next_attempt": float}``. Overlapping
+``dispatch`` runs share it, so every read-modify-write cycle holds an exclusive
+lock on ``<outbox>.lock``. Readers need no lock because writes replace the
+file atomically.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator
+
+import tweepy
+
+try:  # fcntl is POSIX-only; elsewhere only threads in one run are serialised
+    import fcntl
+except ImportError:  # pragma: no cover - exercised only on Windows
+    fcntl = None
+
+__all__ = [
+    "load_outbox",
+    "save_outbox",
+    "queue_reply",
+    "record_failure",
+    "remove_reply",
+    "due_replies",
+    "retry_delay",
+]
+
+# Backoff for failures that don't carry a rate-limit reset time
+BASE_DELAY = 60.0
+MAX_DELAY = 3600.0
+# Give up on replies that keep failing for non-transient reasons
+MAX_ATTEMPTS = 8
+# Failures no retry can fix (a deleted tweet, a reply Twitter refuses)
+PERMANENT_ERRORS = (tweepy.Forbidden, tweepy.NotFound)
+
+# Serialises read-modify-write cycles when mentions are handled in parallel
+_LOCK = threading.Lock()
+
+
+@contextmanager
+def _locked(path: Path) -> Iterator[None]:
+    """Hold the outbox lock for this process's threads and for other runs."""
+
+    with _LOCK, open(path.with_name(path.name + ".lock"), "a") as handle:
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        # Closing the handle releases the file lock
+        yield
+
+
+def load_outbox(path: Path) -> Dict[str, Dict[str, Any]]:
+    """Return the outbox stored at ``path`` (empty if missing or corrupt)."""
+
+    if not path.exists():
+        return {}
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+def save_outbox(path: Path, entries: Dict[str, Dict[str, Any]]) -> None:
+    """Atomically write ``entries`` to ``path``."""
+
+    # A unique temporary file per write, so concurrent writers never share one
+    tmp = None
+    try:
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            json.dump(entries, handle)
+        os.replace(tmp, path)
+    except Exception as exc:
+        print(f"Could not write outbox {path}: {exc}")
+        if tmp is not None and os.path.exists(tmp):
+            os.unlink(tmp)
+
+
+def queue_reply(path: Path, tweet_id: str, text: str) -> None:
+    """Store a generated reply for ``tweet_id`` before attempting to post it."""
+
+    with _locked(path):
+        entries = load_outbox(path)
+        entries[tweet_id] = {"text": text, "attempts": 0, "next_attempt": 0.0}
+        save_outbox(path, entries)
+
+
+def remove_reply(path: Path, tweet_id: str) -> None:
+    """Drop ``tweet_id`` from the outbox, typically after a successful post."""
+
+    with _locked(path):
+        entries = load_outbox(path)
+        if entries.pop(tweet_id, None) is not None:
+            save_outbox(path, entries)
+
+
+def retry_delay(exc: Exception, attempts: int, now: float) -> float:
+    """Return seconds to wait before retrying after ``exc``.
+
+    Twitter 429 responses carry an ``x-rate-limit-reset`` epoch timestamp; when
+    present we wait until then. Everything else uses capped exponential backoff.
+    """
+
+    if isinstance(exc, tweepy.TooManyRequests):
+        response = getattr(exc, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        try:
+            reset = float(headers.get("x-rate-limit-reset"))
+            return max(reset - now, 1.0)
+        except (TypeError, ValueError):
+            pass
+    return min(BASE_DELAY * 2 ** max(attempts - 1, 0), MAX_DELAY)
+
+
+def record_failure(path: Path, tweet_id: str, exc: Exception) -> bool:
+    """Schedule the next retry for ``tweet_id`` after a failed post.
+
+    Entries are dropped at once for :data:`PERMANENT_ERRORS`, and after
+    :data:`MAX_ATTEMPTS` unless the failure was a rate limit or server error,
+    which are always worth retrying.
+
+    Returns
+    -------
+    bool
+        ``True`` if the reply was given up on. Callers should then treat the
+        mention as handled so it isn't regenerated.
+    """
+
+    with _locked(path):
+        entries = load_outbox(path)
+        entry = entries.get(tweet_id)
+        if entry is None:
+            return False
+
+        now = time.time()
+        entry["attempts"] = int(entry.get("attempts", 0)) + 1
+        transient = isinstance(exc, (tweepy.TooManyRequests, tweepy.TwitterServerError))
+        permanent = isinstance(exc, PERMANENT_ERRORS)
+        if permanent or (not transient and entry["attempts"] >= MAX_ATTEMPTS):
+            print(
+                f"Giving up on reply to {tweet_id} after {entry['attempts']} attempts"
+            )
+            entries.pop(tweet_id)
+        else:
+            entry["next_attempt"] = now + retry_delay(exc, entry["attempts"], now)
+        save_outbox(path, entries)
+        return tweet_id not in entries
+
+
+def due_replies(path: Path, now: float | None = None) -> Dict[str, str]:
+    """Return ``{tweet_id: text}`` for entries whose retry time has passed."""
+
+    now = time.time() if now is None else now
+    return {
+        tweet_id: entry["text"]
+        for tweet_id, entry in load_outbox(path).items()
+        if float(entry.get("next_attempt", 0.0)) <= now
+    }
@@ -0,0 +1,136 @@
+"""ReasonBot Prompt Compaction
+
+Tweets carry a lot of text that costs tokens without helping the model:
+leading @handle chains from reply threads, t.co links, hashtag markers and runs
+of the same emoji. This module strips or abbreviates that noise, estimates the
+prompt's token count locally and trims the tweet if a prompt would exceed the
+configured budget (``PROMPT_TOKEN_BUDGET``).
+
+Prompts are built as ``prefix + tweet``. Only the tweet is ever trimmed; if the
+instructions leave too little of the budget for the tweet, :func:`compose`
+raises instead of sending a prompt with no tweet in it.
+
+Primary function: compose(prefix: str, tweet_text: str) -> str
+"""
+
+from __future__ import annotations
+
+import math
+import re
+import threading
+from typing import Dict
+
+import utils
+
+__all__ = [
+    "compact_text",
+    "estimate_tokens",
+    "compose",
+    "stats",
+]
+
+# Default ceiling, in estimated tokens, for a single prompt
+DEFAULT_TOKEN_BUDGET = 300
+# Least tweet text, in estimated tokens, worth sending after truncation
+MIN_TWEET_TOKENS = 8
+
+_LEADING_HANDLES_RE = re.compile(r"^(?:\s*@\w+)+")
+# Not preceded by a word character, so email addresses are left alone
+_HANDLE_RE = re.compile(r"(?<!\w)@\w+")
+_URL_RE = re.compile(r"https?://\S+")
+_REPEATED_LINKS_RE = re.compile(r"\[link\](?:\s*\[link\])+")
+_HASHTAG_RE = re.compile(r"#(\w+)")
+# The same non-ASCII symbol (emoji) repeated, with or without spaces between
+_REPEATED_SYMBOL_RE = re.compile(r"([^\x00-\x7f\w\s])(?:\s*\1)+")
+_REPEATED_PUNCT_RE = re.compile(r"([!?.])\1{3,}")
+
+_LOCK = threading.Lock()
+_STATS = {"prompts": 0, "tokens_before": 0, "tokens_after": 0, "truncated": 0}
+
+
+def compact_text(text: str) -> str:
+    """Return ``text`` with token-wasting noise removed or abbreviated.
+
+    Leading handles are dropped, other handles become ``@user``, links become
+    ``[link]``, ``#`` markers are removed (the word stays), repeated emoji
+    collapse to one and long punctuation runs are cut to three.
+    """
+
+    text = _LEADING_HANDLES_RE.sub("", text)
+    text = _HANDLE_RE.sub("@user", text)
+    text = _URL_RE.sub("[link]", text)
+    text = _REPEATED_LINKS_RE.sub("[link]", text)
+    text = _HASHTAG_RE.sub(r"\1", text)
+    text = _REPEATED_SYMBOL_RE.sub(r"\1", text)
+    text = _REPEATED_PUNCT_RE.sub(r"\1\1\1", text)
+    return " ".join(text.split())
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the tokenizer's count for ``text`` without calling it.
+
+    Uses the usual English rules of thumb (about four characters or three
+    quarters of a word per token) and counts two tokens per non-ASCII
+    character, which covers most emoji.
+    """
+
+    ascii_text = text.encode("ascii", "ignore").decode("ascii")
+    non_ascii = len(text) - len(ascii_text)
+    words = len(ascii_text.split())
+    return math.ceil(max(len(ascii_text) / 4, words * 4 / 3)) + 2 * non_ascii
+
+
+def _token_budget() -> int:
+    try:
+        return int(utils.get_env_var("PROMPT_TOKEN_BUDGET", str(DEFAULT_TOKEN_BUDGET)))
+    except ValueError:
+        return DEFAULT_TOKEN_BUDGET
+
+
+def compose(prefix: str, tweet_text: str, system: str = "") -> str:
+    """Return ``prefix`` followed by the compacted tweet, within the budget.
+
+    ``system`` is any other text sent with the prompt, such as a system
+    message. It isn't part of the returned prompt but counts towards the
+    budget. If the request would exceed ``PROMPT_TOKEN_BUDGET``, words are
+    dropped from the end of the tweet until it fits. Savings are recorded for
+    :func:`stats`.
+
+    Raises
+    ------
+    ValueError
+        If the request is over budget and ``system`` and ``prefix`` leave room
+        for fewer than :data:`MIN_TWEET_TOKENS` tokens of tweet text.
+    """
+
+    compacted = compact_text(tweet_text)
+    # The budget left for the prompt once the other text is counted
+    budget = _token_budget() - estimate_tokens(system)
+
+    truncated = estimate_tokens(prefix + compacted) > budget
+    if truncated:
+        if estimate_tokens(prefix + " …") + MIN_TWEET_TOKENS > budget:
+            raise ValueError(
+                f"Prompt instructions leave less than {MIN_TWEET_TOKENS} of the "
+                f"{_token_budget()} token budget for the tweet"
+            )
+        words = compacted.split()
+        while words and estimate_tokens(prefix + " ".join(words) + " …") > budget:
+            words.pop()
+        compacted = " ".join(words) + " …"
+        print("Prompt exceeded the token budget; tweet text truncated.")
+
+    prompt = prefix + compacted
+    with _LOCK:
+        _STATS["prompts"] += 1
+        _STATS["tokens_before"] += estimate_tokens(prefix + tweet_text)
+        _STATS["tokens_after"] += estimate_tokens(prompt)
+        _STATS["truncated"] += int(truncated)
+    return prompt
+
+
+def stats() -> Dict[str, int]:
+    """Return cumulative prompt counts and estimated tokens before/after."""
+
+    with _LOCK:
+        return dict(_STATS)
@@ -4,33 +4,44 @@ This module constructs replies using template logic, rhetorical framing, and
 cause-effect chains. It adapts tone based on the analyzer’s output and avoids
 moralizing, aiming instead for strategic disarmament.
 
+Replies to recurring claims are served from the curated reply library when
+``REPLY_LIBRARY_FILE`` is set; everything else is written by the LLM.
+
 Primary function: generate_reply(context_data: dict, tweet_text: str) -> str
 """
 
 from __future__ import annotations
 
+from pathlib import Path
 from typing import Any, Dict
 
 from utils import load_env, get_env_var
 import openai
-import backoff
-
-
-@backoff.on_exception(backoff.expo, openai.OpenAIError, max_tries=3)
-def _chat_completion(client: openai.OpenAI, prompt: str):
-    """Call the OpenAI chat completion API with retries."""
-
-    return client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[
-            {
-                "role": "system",
-                "content": "You are ReasonBot, a calm and strategic debater.",
-            },
-            {"role": "user", "content": prompt},
-        ],
-        temperature=0.7,
-    )
+
+import llm
+import prompting
+import reply_library
+import utils
+
+# Rules shared by every reply prompt
+_PROMPT_PREFIX = (
+    "You are ReasonBot. Always: no more than 50 words; avoid moralizing; "
+    "use cause-effect reasoning.\nFor this tweet: "
+)
+
+# Placeholder replies returned when no real reply could be generated. Callers
+# that post replies must check for these rather than publish them.
+NO_KEY_REPLY = "ReasonBot cannot respond right now."
+ERROR_REPLY = "ReasonBot encountered an error and cannot reply."
+FALLBACK_REPLIES = frozenset({NO_KEY_REPLY, ERROR_REPLY})
+
+# Minimum similarity between a tweet and a library claim to serve the vetted reply
+DEFAULT_LIBRARY_THRESHOLD = 0.7
+
+_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": "You are ReasonBot, a calm and strategic debater.",
+}
 
 
 def _build_prompt(context: Dict[str, Any], tweet_text: str) -> str:
@@ -38,7 +49,8 @@ def _build_prompt(context: Dict[str, Any], tweet_text: str) -> str:
 
     The function uses a mini logic tree to decide which instructions to send to
     the model. This keeps the prompt readable and enforces length and tone
-    constraints.
+    constraints. The tweet is compacted and fitted to the token budget by
+    :func:`prompting.compose`.
 
     Parameters
     ----------
@@ -54,12 +66,7 @@ def _build_prompt(context: Dict[str, Any], tweet_text: str) -> str:
     """
 
     reply_tone = context.get("reply_tone", "calm")
-    instructions = [
-        f"Respond in a {reply_tone} tone",
-        "no more than 50 words",
-        "avoid moralizing",
-        "use cause-effect reasoning",
-    ]
+    instructions = [f"Respond in a {reply_tone} tone"]
 
     if context.get("contains_slur"):
         instructions.append("acknowledge the hateful language without repeating it")
@@ -72,12 +79,67 @@ def _build_prompt(context: Dict[str, Any], tweet_text: str) -> str:
     if emotion in {"anger", "rage"} or context.get("tone") == "aggressive":
         instructions.append("defuse the tension")
 
+    # Fixed rules lead and per-tweet instructions follow; only the tweet is
+    # trimmed if the prompt runs over budget.
     instruction_text = "; ".join(instructions)
-    prompt = f"You are ReasonBot. {instruction_text}.\n" f"Tweet: {tweet_text}"
-    return prompt
+    prefix = f"{_PROMPT_PREFIX}{instruction_text}.\nTweet: "
+    return prompting.compose(prefix, tweet_text, system=_SYSTEM_MESSAGE["content"])
+
+
+def _library_reply(context: Dict[str, Any], tweet_text: str) -> str | None:
+    """Return a vetted reply from ``REPLY_LIBRARY_FILE`` if the tweet matches.
+
+    Tweets containing slurs always go to the LLM, since library replies don't
+    acknowledge the hateful language.
+    """
+
+    library_file = utils.get_env_var("REPLY_LIBRARY_FILE")
+    if not library_file or context.get("contains_slur"):
+        return None
+
+    library = reply_library.load_library(Path(library_file))
+    if library is None:
+        return None
+
+    try:
+        threshold = float(
+            utils.get_env_var("REPLY_LIBRARY_THRESHOLD", str(DEFAULT_LIBRARY_THRESHOLD))
+        )
+    except ValueError:
+        threshold = DEFAULT_LIBRARY_THRESHOLD
+
+    # Twitter rejects repeats, so each variant is served once per reuse window
+    served = reply_library.ServedReplies(Path(library_file).with_suffix(".served"))
+    return library.lookup(
+        tweet_text, context.get("reply_tone", "calm"), threshold, served
+    )
 
 
-def generate_reply(context_data: Dict[str, Any], tweet_text: str) -> str:
+def _request_reply(
+    api_key: str,
+    context_data: Dict[str, Any],
+    tweet_text: str,
+    timeout: float | None = None,
+) -> str:
+    """Ask OpenAI for a reply; API errors propagate to the caller."""
+
+    # Built-in retries are off; _chat_completion retries within the deadline
+    client = openai.OpenAI(api_key=api_key, max_retries=0)
+    prompt = _build_prompt(context_data, tweet_text)
+
+    response = llm.chat_completion(
+        client,
+        [_SYSTEM_MESSAGE, {"role": "user", "content": prompt}],
+        temperature=0.7,
+        timeout=timeout,
+    )
+
+    return response.choices[0].message.content.strip()
+
+
+def generate_reply(
+    context_data: Dict[str, Any], tweet_text: str, timeout: float | None = None
+) -> str:
     """Return a strategic reply for the provided tweet.
 
     Parameters
@@ -86,32 +148,38 @@ def generate_reply(context_data: Dict[str, Any], tweet_text: str) -> str:
         The dictionary returned from :func:`analyze_context`.
     tweet_text:
         The full text of the tweet requiring a reply.
+    timeout:
+        Optional limit, in seconds, for the whole OpenAI request including
+        retries and waiting for a limiter slot.
 
     Returns
     -------
     str
-        A tactically worded response generated via OpenAI or a fallback message
-        if the API is unavailable.
+        A tactically worded response generated via OpenAI or one of
+        :data:`FALLBACK_REPLIES` if the API is unavailable.
     """
 
     # Ensure environment variables are loaded before accessing them
     load_env()
+
+    # Recurring claims get a vetted answer without touching the LLM
+    vetted = _library_reply(context_data, tweet_text)
+    if vetted:
+        return vetted
+
     api_key = get_env_var("OPENAI_API_KEY")
 
     if not api_key:
         print(
             "Missing OPENAI_API_KEY. Returning fallback reply while we wait for credentials."
         )
-        return "ReasonBot cannot respond right now."  # short placeholder
+        return NO_KEY_REPLY  # short placeholder
 
     try:
-        client = openai.OpenAI(api_key=api_key)
-        prompt = _build_prompt(context_data, tweet_text)
-
-        response = _chat_completion(client, prompt)
-
-        return response.choices[0].message.content.strip()
+        # Replies are deliberately not coalesced: Twitter rejects identical
+        # replies, so each duplicate mention needs its own wording.
+        return _request_reply(api_key, context_data, tweet_text, timeout)
 
     except Exception as exc:  # broad catch to keep the bot running
         print(f"OpenAI API error: {exc}")
-        return "ReasonBot encountered an error and cannot reply."  # fallback
+        return ERROR_REPLY  # fallback
@@ -0,0 +1,277 @@
+"""ReasonBot Reply Library
+
+A curated set of vetted replies for claims that keep coming up ("the earth is
+flat" and friends). :func:`replier.generate_reply` checks the library first and
+serves a stored reply, in the analyzer's recommended ``reply_tone``, whenever a
+tweet matches a known claim closely enough. Only tweets without a match go to
+the LLM.
+
+Matching uses TF-IDF cosine similarity over word unigrams and bigrams, held in
+an inverted index. A lookup only visits the postings of the query's terms, so it
+stays well under a millisecond with thousands of entries. Query terms that no
+claim uses count towards the query's length at the lowest idf, as if every
+claim used them, so filler ("wake up sheeple") costs a restatement a little
+while a tweet that only shares a word or two with a claim scores low. A tweet
+that negates a claim ("the earth is not flat") or reports someone saying it
+("anyone who says the earth is flat...") never matches it.
+
+The library is a JSON list of entries::
+
+    {"claim": "the earth is flat",
+     "replies": {"calm": ["...", "..."], "sarcastic": "..."}}
+
+Several variants per tone are allowed and one is picked at random, because
+Twitter rejects a reply identical to one the account already posted. A
+:class:`ServedReplies` table, shared through SQLite by every run, records when
+each variant was last served. A variant isn't served again for
+:data:`REUSE_SECONDS`. Once every variant for a claim is in use, the lookup
+misses and the tweet goes to the LLM.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import random
+import re
+import sqlite3
+import sys
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils import normalize_text
+
+__all__ = [
+    "ReplyLibrary",
+    "ServedReplies",
+    "load_library",
+    "promote_reply",
+]
+
+# Tone served when an entry has no variant for the requested one
+DEFAULT_TONE = "calm"
+# Seconds before the same variant may be served again
+REUSE_SECONDS = 7 * 86400.0
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have i in is it its of on or so "
+    "that the their they this to was we were with you your".split()
+)
+_NEGATION_RE = re.compile(r"\b(?:not|no|never|nor|cannot)\b|n't\b")
+# Reporting verbs: the tweet talks about the claim rather than making it
+_REPORTED_RE = re.compile(r"\b(?:say|says|said|saying|claim|claims|think|thinks)\b")
+
+
+def _normalize(text: str) -> str:
+    # Phones type curly apostrophes; treat "isn’t" like "isn't"
+    return normalize_text(text).replace("\u2019", "'")
+
+
+def _stance(text: str) -> Tuple[bool, bool]:
+    """Return whether ``text`` contains a negation and a reporting verb."""
+
+    normalized = _normalize(text)
+    return bool(_NEGATION_RE.search(normalized)), bool(_REPORTED_RE.search(normalized))
+
+
+def _terms(text: str) -> Dict[str, int]:
+    """Return term counts (unigrams and bigrams) for ``text``."""
+
+    words = [w for w in _WORD_RE.findall(_normalize(text)) if w not in _STOPWORDS]
+    counts: Dict[str, int] = {}
+    for term in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+        counts[term] = counts.get(term, 0) + 1
+    return counts
+
+
+class ReplyLibrary:
+    """Inverted TF-IDF index over claim text.
+
+    Parameters
+    ----------
+    entries:
+        Library entries as described in the module docstring.
+    """
+
+    def __init__(self, entries: List[Dict[str, Any]]) -> None:
+        self.entries = list(entries)
+        self._build()
+
+    def _build(self) -> None:
+        doc_terms = [_terms(entry["claim"]) for entry in self.entries]
+        doc_freq: Dict[str, int] = {}
+        for terms in doc_terms:
+            for term in terms:
+                doc_freq[term] = doc_freq.get(term, 0) + 1
+
+        n_docs = len(self.entries)
+        self._idf = {
+            term: math.log((1 + n_docs) / (1 + df)) + 1.0
+            for term, df in doc_freq.items()
+        }
+        # Weight of a term no claim contains: that of a term every claim has
+        self._unseen_idf = 1.0
+        self._stances = [_stance(entry["claim"]) for entry in self.entries]
+        self._postings: Dict[str, List[Tuple[int, float]]] = {}
+        for doc_id, terms in enumerate(doc_terms):
+            weights = {t: c * self._idf[t] for t, c in terms.items()}
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            for term, weight in weights.items():
+                self._postings.setdefault(term, []).append((doc_id, weight / norm))
+
+    def add(self, claim: str, reply: str, tone: str = DEFAULT_TONE) -> None:
+        """Add ``reply`` for ``claim``, merging into an existing identical claim."""
+
+        key = normalize_text(claim)
+        for entry in self.entries:
+            if normalize_text(entry["claim"]) == key:
+                variants = entry["replies"].get(tone, [])
+                if isinstance(variants, str):
+                    variants = [variants]
+                if reply not in variants:
+                    variants.append(reply)
+                entry["replies"][tone] = variants
+                return
+        self.entries.append({"claim": claim, "replies": {tone: [reply]}})
+        self._build()
+
+    def match(self, text: str) -> Tuple[Optional[Dict[str, Any]], float]:
+        """Return the closest entry to ``text`` and its cosine similarity.
+
+        Claims are never returned unless they agree with ``text`` on negation
+        and on reporting verbs.
+        """
+
+        weights = {
+            t: c * self._idf.get(t, self._unseen_idf) for t, c in _terms(text).items()
+        }
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        stance = _stance(text)
+
+        scores: Dict[int, float] = {}
+        for term, weight in weights.items():
+            for doc_id, doc_weight in self._postings.get(term, ()):
+                if self._stances[doc_id] == stance:
+                    scores[doc_id] = scores.get(doc_id, 0.0) + weight * doc_weight
+        if not scores:
+            return None, 0.0
+        best = max(scores, key=scores.__getitem__)
+        return self.entries[best], scores[best] / norm
+
+    def lookup(
+        self,
+        text: str,
+        reply_tone: str,
+        threshold: float,
+        served: Optional[ServedReplies] = None,
+    ) -> Optional[str]:
+        """Return a vetted reply for ``text`` if a claim matches ``threshold``.
+
+        Variants for ``reply_tone`` are preferred, then :data:`DEFAULT_TONE`.
+        With ``served``, only a variant not served recently is returned (and
+        recorded as served); ``None`` means every variant is in use.
+        """
+
+        entry, score = self.match(text)
+        if entry is None or score < threshold:
+            return None
+
+        candidates: List[str] = []
+        for tone in (reply_tone, DEFAULT_TONE):
+            variants = entry["replies"].get(tone) or []
+            if isinstance(variants, str):
+                variants = [variants]
+            fresh = [v for v in variants if v not in candidates]
+            random.shuffle(fresh)
+            candidates.extend(fresh)
+
+        if served is None:
+            return candidates[0] if candidates else None
+        return next((v for v in candidates if served.claim(v)), None)
+
+    def save(self, path: Path) -> None:
+        """Write the library entries to ``path`` as JSON."""
+
+        path.write_text(json.dumps(self.entries, indent=2, ensure_ascii=False) + "\n")
+
+
+class ServedReplies:
+    """SQLite record of when each library reply was last served.
+
+    Parameters
+    ----------
+    path:
+        SQLite database shared by every run on this machine.
+    reuse_after:
+        Seconds before a served reply may be served again.
+    """
+
+    def __init__(self, path: Path, reuse_after: float = REUSE_SECONDS) -> None:
+        self.path = path
+        self.reuse_after = reuse_after
+        self._execute(
+            "CREATE TABLE IF NOT EXISTS served (reply TEXT PRIMARY KEY, at REAL NOT NULL)"
+        )
+
+    def _execute(self, sql: str, params: Tuple[Any, ...] = ()) -> int:
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                return conn.execute(sql, params).rowcount
+        finally:
+            conn.close()
+
+    def claim(self, reply: str) -> bool:
+        """Atomically record ``reply`` as served unless it was served recently."""
+
+        now = time.time()
+        changed = self._execute(
+            """
+            INSERT INTO served (reply, at) VALUES (?, ?)
+            ON CONFLICT (reply) DO UPDATE SET at = excluded.at
+            WHERE served.at < ?
+            """,
+            (reply, now, now - self.reuse_after),
+        )
+        return changed == 1
+
+
+@lru_cache(maxsize=4)
+def _load_cached(path: str, mtime: float) -> ReplyLibrary:
+    return ReplyLibrary(json.loads(Path(path).read_text(encoding="utf-8")))
+
+
+def load_library(path: Path) -> Optional[ReplyLibrary]:
+    """Load and index the library at ``path``.
+
+    The index is cached until the file changes, so promotions are picked up
+    without a restart. Returns ``None`` if the file is missing or invalid.
+    """
+
+    try:
+        return _load_cached(str(path), path.stat().st_mtime)
+    except Exception as exc:
+        print(f"Could not load reply library from {path}: {exc}")
+        return None
+
+
+def promote_reply(path: Path, claim: str, reply: str, tone: str = DEFAULT_TONE) -> None:
+    """Add a reviewed LLM reply to the library file at ``path``."""
+
+    entries = json.loads(path.read_text(encoding="utf-8")) if path.exists() else []
+    library = ReplyLibrary(entries)
+    library.add(claim, reply, tone)
+    library.save(path)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (4, 5):
+        print(
+            'Usage: python reply_library.py <library.json> "<claim>" "<reply>" [tone]'
+        )
+        sys.exit(1)
+    promote_reply(Path(sys.argv[1]), *sys.argv[2:])
+    print(f"Promoted reply for: {sys.argv[2]}")
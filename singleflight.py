@@ -0,0 +1,118 @@
+"""ReasonBot Single-Flight Coalescing
+
+When a brigade hits, many identical mentions arrive in the same poll. Handled
+in parallel, each would start its own OpenAI call before any result exists to
+reuse. A :class:`SingleFlight` group lets the first caller for a key (the
+leader) make the call while concurrent callers with the same key (followers)
+wait and receive its result.
+
+Only real results are shared. If the leader's call raises, followers don't
+inherit the error; they retry once as a fresh flight, so a single transient
+failure doesn't turn every duplicate into a fallback reply.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Dict, Hashable, TypeVar
+
+__all__ = ["SingleFlight", "get_group", "snapshot"]
+
+T = TypeVar("T")
+
+
+class _Call:
+    """One in-flight invocation shared by a leader and its followers."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls that share a key into one execution.
+
+    Parameters
+    ----------
+    name:
+        Label used in :func:`snapshot`.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._counts = {"calls": 0, "collapsed": 0, "failures": 0}
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """Run ``fn`` for ``key`` unless an identical call is already running.
+
+        Followers share the leader's return value (the same object, so callers
+        should copy mutable results). If the leader raises, each follower makes
+        one more attempt as a new flight; the error from that attempt, if any,
+        is raised to its callers.
+        """
+
+        for attempt in range(2):
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = _Call()
+                    self._calls[key] = call
+                    self._counts["calls"] += 1
+
+            if leader:
+                return self._lead(key, call, fn)
+
+            call.done.wait()
+            if call.error is None:
+                with self._lock:
+                    self._counts["collapsed"] += 1
+                return call.result
+            if attempt:
+                raise call.error
+
+        raise AssertionError("unreachable")  # pragma: no cover
+
+    def _lead(self, key: Hashable, call: _Call, fn: Callable[[], T]) -> T:
+        try:
+            call.result = fn()
+        except BaseException as exc:
+            call.error = exc
+            with self._lock:
+                self._counts["failures"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+    def stats(self) -> Dict[str, int]:
+        """Return executed, collapsed and failed call counts."""
+
+        with self._lock:
+            return dict(self._counts)
+
+
+_GROUPS: Dict[str, SingleFlight] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_group(name: str) -> SingleFlight:
+    """Return the shared :class:`SingleFlight` group called ``name``."""
+
+    with _REGISTRY_LOCK:
+        if name not in _GROUPS:
+            _GROUPS[name] = SingleFlight(name)
+        return _GROUPS[name]
+
+
+def snapshot() -> Dict[str, Dict[str, int]]:
+    """Return :meth:`SingleFlight.stats` for every shared group."""
+
+    with _REGISTRY_LOCK:
+        groups = list(_GROUPS.values())
+    return {group.name: group.stats() for group in groups}
@@ -8,7 +8,6 @@ sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
 import analyzer  # noqa: E402
 
-
 EXPECTED_KEYS = {"tone", "ideology", "emotion", "contains_slur", "reply_tone"}
 
 
@@ -85,3 +84,12 @@ def test_analyze_context_openai_error():
         "contains_slur": False,
         "reply_tone": "calm",
     }
+
+
+def test_analyze_context_disables_client_retries():
+    with patch("utils.load_env"), patch(
+        "analyzer.get_env_var", return_value="k"
+    ), patch("analyzer.openai.OpenAI") as MockClient:
+        analyzer.analyze_context("text")
+
+    MockClient.assert_called_once_with(api_key="k", max_retries=0)
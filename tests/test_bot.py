@@ -49,8 +49,8 @@ def test_dispatch_posts_replies(tmp_path):
     cache_file = tmp_path / "ids.txt"
 
     with patch("bot.PROCESSED_FILE", cache_file), patch(
-        "bot.check_mentions", return_value=[mock_tweet]
-    ), patch(
+        "bot.OUTBOX_FILE", tmp_path / "outbox.json"
+    ), patch("bot.check_mentions", return_value=[mock_tweet]), patch(
         "bot.analyzer.analyze_context", return_value={"reply_tone": "calm"}
     ), patch(
         "bot.replier.generate_reply", return_value="ok"
@@ -94,8 +94,10 @@ def test_dispatch_respects_cooldown(tmp_path):
     cache_file = tmp_path / "ids.txt"
 
     with patch("bot.PROCESSED_FILE", cache_file), patch(
-        "bot.is_rate_limited", return_value=True
-    ) as mock_rate, patch("bot.check_mentions") as check, patch(
+        "bot.OUTBOX_FILE", tmp_path / "outbox.json"
+    ), patch("bot.is_rate_limited", return_value=True) as mock_rate, patch(
+        "bot.check_mentions"
+    ) as check, patch(
         "utils.load_env"
     ), patch(
         "utils.get_env_var",
@@ -122,9 +124,13 @@ def test_dispatch_missing_twitter_credentials(tmp_path):
     cache_file = tmp_path / "ids.txt"
 
     with patch("bot.PROCESSED_FILE", cache_file), patch(
+        "bot.OUTBOX_FILE", tmp_path / "outbox.json"
+    ), patch(
         "bot.check_mentions",
         return_value=[mock_tweet],
-    ), patch("bot.load_processed_ids", return_value=set()), patch(
+    ), patch(
+        "bot.load_processed_ids", return_value=set()
+    ), patch(
         "utils.load_env"
     ), patch(
         "utils.get_env_var",
@@ -149,6 +155,8 @@ def test_dispatch_handles_openai_error(tmp_path):
     cache_file = tmp_path / "ids.txt"
 
     with patch("bot.PROCESSED_FILE", cache_file), patch(
+        "bot.OUTBOX_FILE", tmp_path / "outbox.json"
+    ), patch(
         "bot.check_mentions",
         return_value=[mock_tweet],
     ), patch(
@@ -186,3 +194,328 @@ def test_dispatch_handles_openai_error(tmp_path):
         client_instance.create_tweet.assert_not_called()
         save_id.assert_not_called()
         p.assert_any_call("Error replying to 1: boom")
+        p.assert_any_call(
+            "Dispatch summary: 0 full, 0 local_analysis, 0 deferred, 1 failed, 0 leased"
+        )
+
+
+def test_dispatch_retries_failed_post_without_regenerating(tmp_path):
+    """A failed post keeps the reply queued and retries it on the next run."""
+    mock_tweet = MagicMock(id=1, text="hi")
+    cache_file = tmp_path / "ids.txt"
+    outbox_file = tmp_path / "outbox.json"
+
+    with patch("bot.PROCESSED_FILE", cache_file), patch(
+        "bot.OUTBOX_FILE", outbox_file
+    ), patch("bot.check_mentions", return_value=[mock_tweet]), patch(
+        "bot.analyzer.analyze_context", return_value={"reply_tone": "calm"}
+    ) as analyze, patch(
+        "bot.replier.generate_reply", return_value="ok"
+    ) as gen_reply, patch(
+        "bot.tweepy.Client"
+    ) as MockClient, patch(
+        "utils.load_env"
+    ), patch(
+        "utils.get_env_var",
+        side_effect=lambda name: {
+            "TWITTER_BEARER_TOKEN": "token",
+            "TWITTER_USER_ID": "1",
+            "TWITTER_API_KEY": "a",
+            "TWITTER_API_SECRET": "b",
+            "TWITTER_ACCESS_TOKEN": "c",
+            "TWITTER_ACCESS_SECRET": "d",
+        }.get(name),
+    ), patch(
+        "outbox.time.time", return_value=0.0
+    ):
+        client_instance = MockClient.return_value
+        client_instance.create_tweet.side_effect = [RuntimeError("503"), None]
+
+        bot.dispatch(1)
+        assert not cache_file.exists()
+        assert bot.outbox.load_outbox(outbox_file)["1"]["text"] == "ok"
+
+        # Still backing off: nothing is posted or regenerated
+        bot.dispatch(1)
+        assert client_instance.create_tweet.call_count == 1
+
+        with patch("outbox.time.time", return_value=bot.outbox.BASE_DELAY):
+            bot.dispatch(1)
+
+        assert analyze.call_count == 1
+        assert gen_reply.call_count == 1
+        client_instance.create_tweet.assert_called_with(
+            text="ok", in_reply_to_tweet_id="1"
+        )
+        assert cache_file.read_text() == "1\n"
+        assert bot.outbox.load_outbox(outbox_file) == {}
+
+
+def test_dispatch_never_regenerates_a_reply_it_gave_up_on(tmp_path):
+    """A reply Twitter refuses for good is not paid for again next run."""
+    mock_tweet = MagicMock(id=1, text="hi")
+    cache_file = tmp_path / "ids.txt"
+    outbox_file = tmp_path / "outbox.json"
+    response = MagicMock(status_code=403, headers={})
+    response.json.return_value = {}
+
+    with patch("bot.PROCESSED_FILE", cache_file), patch(
+        "bot.OUTBOX_FILE", outbox_file
+    ), patch("bot.check_mentions", return_value=[mock_tweet]), patch(
+        "bot.analyzer.analyze_context", return_value={"reply_tone": "calm"}
+    ), patch(
+        "bot.replier.generate_reply", return_value="ok"
+    ) as gen_reply, patch(
+        "bot.tweepy.Client"
+    ) as MockClient, patch(
+        "utils.load_env"
+    ), patch(
+        "utils.get_env_var",
+        side_effect=lambda name, default=None: {
+            "TWITTER_BEARER_TOKEN": "token",
+            "TWITTER_USER_ID": "1",
+            "TWITTER_API_KEY": "a",
+            "TWITTER_API_SECRET": "b",
+            "TWITTER_ACCESS_TOKEN": "c",
+            "TWITTER_ACCESS_SECRET": "d",
+        }.get(name, default),
+    ):
+        client_instance = MockClient.return_value
+        client_instance.create_tweet.side_effect = bot.tweepy.Forbidden(response)
+
+        bot.dispatch(1)
+        bot.dispatch(1)
+
+        assert gen_reply.call_count == 1
+        assert client_instance.create_tweet.call_count == 1
+        assert cache_file.read_text() == "1\n"
+        assert bot.outbox.load_outbox(outbox_file) == {}
+
+    assert bot.LeaseTable(cache_file.with_suffix(".leases")).claim("1") is False
+
+
+def test_choose_level_degrades_as_deadline_nears():
+    """Less time left should mean fewer OpenAI calls per mention."""
+    limiter = MagicMock()
+    limiter.stats.return_value = {"latency": 3.0}
+    budget = MagicMock()
+
+    with patch("bot.concurrency.get_limiter", return_value=limiter):
+        assert bot._choose_level(None, False) == "full"
+
+        budget.remaining.return_value = 8.0
+        assert bot._choose_level(budget, False) == "full"
+        assert bot._choose_level(budget, True) == "full"
+
+        budget.remaining.return_value = 6.0
+        assert bot._choose_level(budget, False) == "local_analysis"
+        assert bot._choose_level(budget, True) == "full"
+
+        budget.remaining.return_value = 4.0
+        assert bot._choose_level(budget, False) == "deferred"
+
+
+def test_dispatch_defers_mentions_when_out_of_time(tmp_path):
+    """Mentions that can't finish before the deadline are left for next run."""
+    tweets = [MagicMock(id=1, text="a"), MagicMock(id=2, text="b")]
+    cache_file = tmp_path / "ids.txt"
+
+    with patch("bot.PROCESSED_FILE", cache_file), patch(
+        "bot.OUTBOX_FILE", tmp_path / "outbox.json"
+    ), patch("bot.check_mentions", return_value=tweets), patch(
+        "bot.analyzer.analyze_context"
+    ) as analyze, patch(
+        "bot.replier.generate_reply", return_value="ok"
+    ) as gen_reply, patch(
+        "bot._choose_level", side_effect=["local_analysis", "deferred"]
+    ), patch(
+        "bot.tweepy.Client"
+    ) as MockClient, patch(
+        "utils.load_env"
+    ), patch(
+        "utils.get_env_var",
+        side_effect=lambda name, default=None: {
+            "TWITTER_BEARER_TOKEN": "token",
+            "TWITTER_USER_ID": "1",
+            "TWITTER_API_KEY": "a",
+            "TWITTER_API_SECRET": "b",
+            "TWITTER_ACCESS_TOKEN": "c",
+            "TWITTER_ACCESS_SECRET": "d",
+        }.get(name, default),
+    ), patch(
+        "builtins.print"
+    ) as p:
+        bot.dispatch(2, deadline=30)
+
+        analyze.assert_not_called()
+        gen_reply.assert_called_once()
+        assert gen_reply.call_args.args[0]["reply_tone"] == "calm"
+        assert gen_reply.call_args.kwargs["timeout"] > 0
+        MockClient.return_value.create_tweet.assert_called_once_with(
+            text="ok", in_reply_to_tweet_id=1
+        )
+        assert cache_file.read_text() == "1\n"
+        p.assert_any_call(
+            "Dispatch summary: 0 full, 1 local_analysis, 1 deferred, 0 failed, 0 leased"
+        )
+
+
+def test_dispatch_skips_mentions_leased_by_another_run(tmp_path, capsys):
+    """Overlapping runs split mentions instead of replying twice."""
+    tweets = [MagicMock(id=1, text="a"), MagicMock(id=2, text="b")]
+    cache_file = tmp_path / "ids.txt"
+
+    other_run = bot.LeaseTable(cache_file.with_suffix(".leases"))
+    assert other_run.claim("1")
+
+    with patch("bot.PROCESSED_FILE", cache_file), patch(
+        "bot.OUTBOX_FILE", tmp_path / "outbox.json"
+    ), patch("bot.check_mentions", return_value=tweets), patch(
+        "bot.analyzer.analyze_context", return_value={"reply_tone": "calm"}
+    ) as analyze, patch(
+        "bot.replier.generate_reply", return_value="ok"
+    ), patch(
+        "bot.tweepy.Client"
+    ) as MockClient, patch(
+        "utils.load_env"
+    ), patch(
+        "utils.get_env_var",
+        side_effect=lambda name, default=None: {
+            "TWITTER_BEARER_TOKEN": "token",
+            "TWITTER_USER_ID": "1",
+            "TWITTER_API_KEY": "a",
+            "TWITTER_API_SECRET": "b",
+            "TWITTER_ACCESS_TOKEN": "c",
+            "TWITTER_ACCESS_SECRET": "d",
+        }.get(name, default),
+    ):
+        bot.dispatch(2)
+
+        analyze.assert_called_once_with("b", timeout=None)
+        MockClient.return_value.create_tweet.assert_called_once_with(
+            text="ok", in_reply_to_tweet_id=2
+        )
+
+    # The finished mention stays claimed even for a run with a stale cache
+    assert other_run.claim("2") is False
+    out = capsys.readouterr().out
+    assert (
+        "Dispatch summary: 1 full, 0 local_analysis, 0 deferred, 0 failed, 1 leased"
+        in out
+    )
+    assert "Skipped 1 mentions already claimed by another run" in out
+
+
+def test_dispatch_does_not_queue_fallback_replies(tmp_path):
+    """Placeholder replies from generate_reply are never queued or posted."""
+    mock_tweet = MagicMock(id=1, text="hi")
+    cache_file = tmp_path / "ids.txt"
+    outbox_file = tmp_path / "outbox.json"
+
+    with patch("bot.PROCESSED_FILE", cache_file), patch(
+        "bot.OUTBOX_FILE", outbox_file
+    ), patch("bot.check_mentions", return_value=[mock_tweet]), patch(
+        "bot.analyzer.analyze_context", return_value={"reply_tone": "calm"}
+    ), patch(
+        "bot.replier.generate_reply", return_value=bot.replier.ERROR_REPLY
+    ), patch(
+        "bot.tweepy.Client"
+    ) as MockClient, patch(
+        "utils.load_env"
+    ), patch(
+        "utils.get_env_var",
+        side_effect=lambda name, default=None: {
+            "TWITTER_BEARER_TOKEN": "token",
+            "TWITTER_USER_ID": "1",
+            "TWITTER_API_KEY": "a",
+            "TWITTER_API_SECRET": "b",
+            "TWITTER_ACCESS_TOKEN": "c",
+            "TWITTER_ACCESS_SECRET": "d",
+        }.get(name, default),
+    ):
+        bot.dispatch(1)
+
+        MockClient.return_value.create_tweet.assert_not_called()
+        assert bot.outbox.load_outbox(outbox_file) == {}
+        assert not cache_file.exists()
+
+    # The lease was released, so the next run can try again
+    assert bot.LeaseTable(cache_file.with_suffix(".leases")).claim("1") is True
+
+
+def test_handle_mention_defers_when_analysis_uses_up_the_budget(tmp_path):
+    """No reply call (and no placeholder post) once the deadline is too close."""
+    tweet = MagicMock(id=7, text="hi")
+    budget = MagicMock()
+    budget.timeout.return_value = 10.0
+    budget.remaining.return_value = 0.5
+    leases = bot.LeaseTable(tmp_path / "leases.db")
+    client = MagicMock()
+
+    with patch("bot._choose_level", return_value="full"), patch(
+        "bot.analyzer.analyze_context", return_value={"reply_tone": "calm"}
+    ), patch("bot.replier.generate_reply") as gen_reply, patch(
+        "bot.OUTBOX_FILE", tmp_path / "outbox.json"
+    ):
+        level = bot._handle_mention(client, tweet, None, set(), budget, leases)
+
+    assert level == "deferred"
+    gen_reply.assert_not_called()
+    client.create_tweet.assert_not_called()
+    assert bot.LeaseTable(tmp_path / "leases.db").claim("7") is True
+
+
+def test_post_reply_skips_when_lease_was_taken_over(tmp_path):
+    """A run that outlived its lease doesn't post over the run that took it."""
+    path = tmp_path / "leases.db"
+    slow_run = bot.LeaseTable(path, ttl=10)
+    client = MagicMock()
+
+    with patch("leases.time.time", return_value=1000.0):
+        assert slow_run.claim("1")
+    with patch("leases.time.time", return_value=1011.0):
+        assert bot.LeaseTable(path, ttl=10).claim("1")
+        with patch("bot.OUTBOX_FILE", tmp_path / "outbox.json"), patch(
+            "bot.PROCESSED_FILE", tmp_path / "ids.txt"
+        ):
+            bot.outbox.queue_reply(bot.OUTBOX_FILE, "1", "ok")
+            assert bot._post_reply(client, 1, "ok", set(), slow_run) is False
+
+    client.create_tweet.assert_not_called()
+    assert "1" in bot.outbox.load_outbox(tmp_path / "outbox.json")
+
+
+def test_run_settings_parse_and_validate_env(capsys):
+    env = {"DISPATCH_DEADLINE": "30", "DISPATCH_WORKERS": "8"}
+    with patch("bot.get_env_var", side_effect=lambda name, default=None: env.get(name)):
+        assert bot._run_settings() == (30.0, 8)
+
+        env.clear()
+        assert bot._run_settings() == (None, bot.DEFAULT_WORKERS)
+
+        env.update(DISPATCH_DEADLINE="soon", DISPATCH_WORKERS="0")
+        assert bot._run_settings() == (None, bot.DEFAULT_WORKERS)
+
+    out = capsys.readouterr().out
+    assert "DISPATCH_DEADLINE must be a number" in out
+    assert "DISPATCH_WORKERS must be a positive whole number" in out
+
+
+def test_analysis_timeout_keeps_time_for_the_reply():
+    """Analysis must not spend the time the reply call will need."""
+    budget = bot.Deadline(30)
+    with patch("bot._llm_seconds", return_value=5.0), patch.object(
+        budget, "remaining", return_value=20.0
+    ):
+        assert bot._stage_timeout(budget) == 20.0 - bot.POST_SECONDS
+        assert bot._stage_timeout(budget, later_calls=1) == 15.0 - bot.POST_SECONDS
+    assert bot._stage_timeout(None, later_calls=1) is None
+
+
+def test_report_compaction_averages_over_prompts_built(capsys):
+    before = {"prompts": 10, "tokens_before": 1000, "tokens_after": 800}
+    after = {"prompts": 14, "tokens_before": 1400, "tokens_after": 1000}
+    with patch("bot.prompting.stats", return_value=after):
+        bot._report_compaction(before)
+
+    assert "saved ~200 tokens (~50.0 per prompt)" in capsys.readouterr().out
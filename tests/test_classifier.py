@@ -0,0 +1,145 @@
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+pytest.importorskip("numpy")
+
+import analyzer  # noqa: E402
+import classifier  # noqa: E402
+
+HOSTILE = {
+    "tone": "aggressive",
+    "ideology": "conspiracy",
+    "emotion": "anger",
+    "contains_slur": False,
+    "reply_tone": "calm",
+}
+FRIENDLY = {
+    "tone": "neutral",
+    "ideology": "unknown",
+    "emotion": "joy",
+    "contains_slur": False,
+    "reply_tone": "friendly",
+}
+
+
+SLUR = {**HOSTILE, "contains_slur": True}
+
+
+def _records():
+    return [
+        ("the moon landing was faked wake up sheeple", HOSTILE),
+        ("you filthy vermin slur people should leave", SLUR),
+        ("vaccines are a plot you idiots are blind", HOSTILE),
+        ("they hide the truth about chemtrails wake up", HOSTILE),
+        ("lovely weather today, enjoy the sunshine", FRIENDLY),
+        ("thanks for the great thread, really enjoyed it", FRIENDLY),
+        ("happy to see everyone having a good day", FRIENDLY),
+    ]
+
+
+def test_train_predict_roundtrip(tmp_path):
+    """A trained model should survive save/load and keep its predictions."""
+    model = classifier.train(_records(), n_features=2**10, epochs=50)
+    model.save(tmp_path)
+
+    loaded = classifier.load_classifier(tmp_path)
+    texts = ["wake up sheeple the truth is hidden", "enjoy the sunshine everyone"]
+    predictions = loaded.predict(texts)
+
+    assert predictions[0][0]["ideology"] == "conspiracy"
+    assert predictions[1][0]["emotion"] == "joy"
+    assert predictions[1][0]["contains_slur"] is False
+    for _, confidences in predictions:
+        assert set(confidences) == set(classifier.FIELDS)
+        assert all(0.0 <= c <= 1.0 for c in confidences.values())
+
+
+def test_single_label_fields_are_never_confident(tmp_path, capsys):
+    """A log without slurs must not make contains_slur look certain."""
+    records = [
+        (text, {**analysis, "contains_slur": False}) for text, analysis in _records()
+    ]
+    model = classifier.train(records, n_features=2**10, epochs=5)
+    assert "contains_slur" not in model.labels
+    assert "Skipping contains_slur" in capsys.readouterr().out
+
+    model.save(tmp_path)
+    analyzer._local_classifier.cache_clear()
+    env = {"LOCAL_CLASSIFIER_DIR": str(tmp_path)}
+    with patch("utils.load_env"), patch(
+        "utils.get_env_var",
+        side_effect=lambda name, default=None: env.get(name, default),
+    ):
+        assert analyzer.classify_batch(["you filthy slur"], threshold=0.0) == [None]
+
+    # Models saved before single-label fields were skipped still omit them
+    weights = dict(model.weights, contains_slur=model.weights["tone"][:, :1])
+    labels = dict(model.labels, contains_slur=[False])
+    legacy = classifier.LocalClassifier(weights, labels)
+    assert "contains_slur" not in legacy.predict(["hi"])[0][1]
+
+
+def test_train_rejects_logs_without_usable_fields():
+    with pytest.raises(ValueError):
+        classifier.train([])
+    with pytest.raises(ValueError):
+        classifier.train([("hi", FRIENDLY), ("hello", FRIENDLY)])
+
+
+def test_load_classifier_missing_dir(tmp_path):
+    assert classifier.load_classifier(tmp_path / "missing") is None
+
+
+def test_load_training_log_skips_bad_lines(tmp_path):
+    log = tmp_path / "log.jsonl"
+    log.write_text(json.dumps({"text": "hi", "analysis": FRIENDLY}) + "\nnot json\n\n")
+    assert classifier.load_training_log(log) == [("hi", FRIENDLY)]
+
+
+def test_classify_batch_threshold(tmp_path):
+    """Only confident local predictions should replace the LLM call."""
+    classifier.train(_records(), n_features=2**10, epochs=50).save(tmp_path)
+    analyzer._local_classifier.cache_clear()
+
+    env = {"LOCAL_CLASSIFIER_DIR": str(tmp_path)}
+    texts = ["wake up sheeple", "enjoy the sunshine"]
+
+    with patch("utils.load_env"), patch(
+        "utils.get_env_var",
+        side_effect=lambda name, default=None: {
+            **env,
+            "LOCAL_CLASSIFIER_THRESHOLD": "0.0",
+        }.get(name, default),
+    ):
+        assert all(analyzer.classify_batch(texts))
+
+    with patch("utils.load_env"), patch(
+        "utils.get_env_var",
+        side_effect=lambda name, default=None: {
+            **env,
+            "LOCAL_CLASSIFIER_THRESHOLD": "1.01",
+        }.get(name, default),
+    ):
+        assert analyzer.classify_batch(texts) == [None, None]
+
+
+def test_classify_batch_rejects_one_unconfident_field():
+    """A single field under the threshold sends the tweet to the LLM."""
+    confident = {field: 0.99 for field in classifier.FIELDS}
+    shaky = {**confident, "ideology": 0.5}
+    model = MagicMock()
+    model.predict.return_value = [(HOSTILE, shaky), (FRIENDLY, confident)]
+
+    env = {"LOCAL_CLASSIFIER_DIR": "model", "LOCAL_CLASSIFIER_THRESHOLD": "0.8"}
+    with patch("utils.load_env"), patch(
+        "utils.get_env_var",
+        side_effect=lambda name, default=None: env.get(name, default),
+    ), patch("analyzer._local_classifier", return_value=model):
+        assert analyzer.classify_batch(["a", "b"]) == [None, FRIENDLY]
+
+
+def test_classify_batch_without_model():
+    with patch("utils.load_env"), patch("utils.get_env_var", return_value=None):
+        assert analyzer.classify_batch(["a", "b"]) == [None, None]
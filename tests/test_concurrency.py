@@ -0,0 +1,156 @@
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+import concurrency
+
+
+def _throttled():
+    exc = RuntimeError("429")
+    exc.response = MagicMock(status_code=429)
+    return exc
+
+
+def test_limit_grows_on_success_and_halves_on_429():
+    limiter = concurrency.AdaptiveLimiter("t", initial=2, max_limit=10, cooldown=0)
+
+    for _ in range(6):
+        with limiter.slot():
+            pass
+    assert limiter.limit == 4
+
+    with pytest.raises(RuntimeError):
+        with limiter.slot():
+            raise _throttled()
+
+    stats = limiter.stats()
+    assert stats["limit"] == 2
+    assert stats["throttled"] == 1
+    assert stats["in_flight"] == 0
+
+
+def test_limit_changes_are_printed(capsys):
+    limiter = concurrency.AdaptiveLimiter("t", initial=1, max_limit=10, cooldown=0)
+    with limiter.slot():
+        pass
+    with pytest.raises(RuntimeError):
+        with limiter.slot():
+            raise _throttled()
+
+    out = capsys.readouterr().out
+    assert "t concurrency limit 1 -> 2 (healthy)" in out
+    assert "t concurrency limit 2 -> 1 (429)" in out
+
+
+def test_cooldown_limits_consecutive_cuts():
+    limiter = concurrency.AdaptiveLimiter("t", initial=8, cooldown=60)
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            with limiter.slot():
+                raise _throttled()
+    assert limiter.limit == 4
+
+
+def test_other_errors_do_not_change_limit():
+    limiter = concurrency.AdaptiveLimiter("t", initial=3)
+    with pytest.raises(ValueError):
+        with limiter.slot():
+            raise ValueError("bad request")
+    assert limiter.limit == 3
+    assert limiter.stats()["errors"] == 1
+
+
+def test_threads_never_exceed_limit():
+    limiter = concurrency.AdaptiveLimiter("t", initial=2, max_limit=2)
+    peak = 0
+    lock = threading.Lock()
+
+    @limiter.wrap
+    def work():
+        nonlocal peak
+        with lock:
+            peak = max(peak, limiter.stats()["in_flight"])
+        time.sleep(0.01)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert peak == 2
+    assert limiter.stats()["successes"] == 8
+
+
+def test_async_slots_respect_limit():
+    limiter = concurrency.AdaptiveLimiter("t", initial=1, max_limit=1)
+    running = 0
+    peak = 0
+
+    @limiter.wrap
+    async def work():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    async def main():
+        await asyncio.gather(*(work() for _ in range(4)))
+
+    asyncio.run(main())
+    assert peak == 1
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_get_limiter_is_shared():
+    assert concurrency.get_limiter("openai") is concurrency.get_limiter("openai")
+    assert "openai" in concurrency.snapshot()
+
+
+def test_cancelled_async_waiter_passes_on_its_wakeup():
+    """Cancelling a woken waiter must not strand the others."""
+    limiter = concurrency.AdaptiveLimiter("t", initial=1, max_limit=1)
+
+    async def main():
+        release = asyncio.Event()
+
+        async def holder():
+            async with limiter.async_slot():
+                await release.wait()
+
+        async def waiter():
+            async with limiter.async_slot():
+                return "got slot"
+
+        held = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        first = asyncio.create_task(waiter())
+        second = asyncio.create_task(waiter())
+        await asyncio.sleep(0)
+
+        # Free the slot (waking ``first``), then cancel ``first`` before it runs
+        release.set()
+        await held
+        first.cancel()
+
+        assert await asyncio.wait_for(second, timeout=1) == "got slot"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(main())
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_slot_wait_respects_timeout():
+    limiter = concurrency.AdaptiveLimiter("t", initial=1, max_limit=1)
+    with limiter.slot():
+        start = time.monotonic()
+        with pytest.raises(TimeoutError):
+            with limiter.slot(timeout=0.05):
+                pass
+        assert time.monotonic() - start < 0.5
+    assert limiter.stats()["in_flight"] == 0
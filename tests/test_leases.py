@@ -0,0 +1,74 @@
+from unittest.mock import patch
+
+import leases
+
+
+def test_claim_is_exclusive_between_runs(tmp_path):
+    path = tmp_path / "leases.db"
+    run_a = leases.LeaseTable(path)
+    run_b = leases.LeaseTable(path)
+
+    assert run_a.claim("1") is True
+    assert run_a.claim("1") is True  # re-claiming our own lease renews it
+    assert run_b.claim("1") is False
+    assert run_b.claim("2") is True
+
+
+def test_release_and_expiry_free_the_lease(tmp_path):
+    path = tmp_path / "leases.db"
+    run_a = leases.LeaseTable(path, ttl=10)
+    run_b = leases.LeaseTable(path, ttl=10)
+
+    with patch("leases.time.time", return_value=1000.0):
+        assert run_a.claim("1")
+        assert run_a.claim("2")
+        run_a.release("1")
+        assert run_b.claim("1") is True
+        assert run_b.claim("2") is False
+
+    # run_a crashed: its lease on "2" expires and run_b takes over
+    with patch("leases.time.time", return_value=1011.0):
+        assert run_b.claim("2") is True
+
+
+def test_completed_mentions_are_never_reclaimed(tmp_path):
+    path = tmp_path / "leases.db"
+    run_a = leases.LeaseTable(path, ttl=10)
+    run_b = leases.LeaseTable(path, ttl=10)
+
+    with patch("leases.time.time", return_value=1000.0):
+        run_a.claim("1")
+        run_a.complete("1")
+        run_a.release("1")  # no effect once completed
+
+    with patch("leases.time.time", return_value=5000.0):
+        assert run_b.claim("1") is False
+
+    # Completed rows are pruned once they are older than the retention window
+    with patch("leases.time.time", return_value=1000.0 + leases.DONE_RETENTION + 1):
+        run_c = leases.LeaseTable(path)
+        assert run_c.claim("1") is True
+
+
+def test_renew_only_extends_a_lease_still_held(tmp_path):
+    path = tmp_path / "leases.db"
+    run_a = leases.LeaseTable(path, ttl=10)
+    run_b = leases.LeaseTable(path, ttl=10)
+
+    with patch("leases.time.time", return_value=1000.0):
+        assert run_a.claim("1")
+        assert run_a.renew("2") is False  # never claimed
+
+    with patch("leases.time.time", return_value=1009.0):
+        assert run_a.renew("1") is True
+
+    # Renewed at 1009, so still held at 1015
+    with patch("leases.time.time", return_value=1015.0):
+        assert run_b.claim("1") is False
+
+    # Expired and taken over: renewing must fail rather than steal it back
+    with patch("leases.time.time", return_value=1020.0):
+        assert run_b.claim("1") is True
+        assert run_a.renew("1") is False
+        run_b.complete("1")
+        assert run_b.renew("1") is False
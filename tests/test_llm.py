@@ -0,0 +1,20 @@
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+import llm
+
+
+def test_chat_completion_stays_within_timeout():
+    """Retries and backoff sleeps must not run past the caller's timeout."""
+    client = MagicMock()
+    client.chat.completions.create.side_effect = llm.openai.OpenAIError("slow")
+
+    start = time.monotonic()
+    with pytest.raises((llm.openai.OpenAIError, TimeoutError)):
+        llm.chat_completion(client, [], temperature=0, timeout=0.3)
+
+    assert time.monotonic() - start < 0.6
+    for call in client.chat.completions.create.call_args_list:
+        assert 0 < call.kwargs["timeout"] <= 0.3
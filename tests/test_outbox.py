@@ -0,0 +1,89 @@
+import multiprocessing
+from unittest.mock import MagicMock, patch
+
+import pytest
+import tweepy
+
+import outbox
+
+
+def _rate_limit_error(reset):
+    response = MagicMock(status_code=429, headers={"x-rate-limit-reset": str(reset)})
+    response.json.return_value = {}
+    return tweepy.TooManyRequests(response)
+
+
+def test_queue_and_remove(tmp_path):
+    path = tmp_path / "outbox.json"
+    outbox.queue_reply(path, "1", "hello")
+    assert outbox.due_replies(path) == {"1": "hello"}
+
+    outbox.remove_reply(path, "1")
+    assert outbox.load_outbox(path) == {}
+
+
+def test_record_failure_uses_rate_limit_reset(tmp_path):
+    path = tmp_path / "outbox.json"
+    outbox.queue_reply(path, "1", "hello")
+
+    with patch("outbox.time.time", return_value=1000.0):
+        outbox.record_failure(path, "1", _rate_limit_error(1300))
+
+    entry = outbox.load_outbox(path)["1"]
+    assert entry["attempts"] == 1
+    assert entry["next_attempt"] == 1300.0
+    assert outbox.due_replies(path, now=1299.0) == {}
+    assert outbox.due_replies(path, now=1300.0) == {"1": "hello"}
+
+
+def test_record_failure_exponential_backoff_and_give_up(tmp_path):
+    path = tmp_path / "outbox.json"
+    outbox.queue_reply(path, "1", "hello")
+
+    with patch("outbox.time.time", return_value=0.0):
+        outbox.record_failure(path, "1", RuntimeError("boom"))
+        assert outbox.load_outbox(path)["1"]["next_attempt"] == outbox.BASE_DELAY
+        outbox.record_failure(path, "1", RuntimeError("boom"))
+        assert outbox.load_outbox(path)["1"]["next_attempt"] == 2 * outbox.BASE_DELAY
+
+        for _ in range(outbox.MAX_ATTEMPTS):
+            outbox.record_failure(path, "1", RuntimeError("boom"))
+
+    assert outbox.load_outbox(path) == {}
+
+
+def test_permanent_failures_give_up_at_once(tmp_path):
+    path = tmp_path / "outbox.json"
+    outbox.queue_reply(path, "1", "hello")
+    outbox.queue_reply(path, "2", "hello")
+
+    response = MagicMock(status_code=403, headers={})
+    response.json.return_value = {}
+    assert outbox.record_failure(path, "1", tweepy.Forbidden(response)) is True
+    assert outbox.record_failure(path, "2", RuntimeError("boom")) is False
+    assert list(outbox.load_outbox(path)) == ["2"]
+
+
+def test_load_outbox_corrupt_file(tmp_path):
+    path = tmp_path / "outbox.json"
+    path.write_text("{not json")
+    assert outbox.load_outbox(path) == {}
+
+
+def _queue_many(path, prefix):
+    for i in range(25):
+        outbox.queue_reply(path, f"{prefix}{i}", "hello")
+
+
+@pytest.mark.skipif(outbox.fcntl is None, reason="file locks need fcntl")
+def test_concurrent_runs_do_not_lose_entries(tmp_path):
+    path = tmp_path / "outbox.json"
+    ctx = multiprocessing.get_context("fork")
+    runs = [ctx.Process(target=_queue_many, args=(path, prefix)) for prefix in "ab"]
+    for run in runs:
+        run.start()
+    for run in runs:
+        run.join()
+
+    assert len(outbox.load_outbox(path)) == 50
+    assert not list(tmp_path.glob("*.tmp"))
@@ -0,0 +1,66 @@
+from unittest.mock import patch
+
+import pytest
+
+import prompting
+
+
+def test_compact_text_strips_noise():
+    text = (
+        "@ReasonBot @alice   the earth is flat!!!!!! 😂😂 😂 #FlatEarth #truth "
+        "ask @bob https://t.co/abc https://t.co/def or mail me@example.com"
+    )
+    assert prompting.compact_text(text) == (
+        "the earth is flat!!! 😂 FlatEarth truth ask @user [link] or mail me@example.com"
+    )
+
+
+def test_estimate_tokens_counts_words_and_emoji():
+    assert prompting.estimate_tokens("") == 0
+    assert prompting.estimate_tokens("one two three") == 4
+    assert prompting.estimate_tokens("😂") == 2
+
+
+def test_compose_keeps_prefix_and_records_savings():
+    before = prompting.stats()
+    with patch("utils.get_env_var", side_effect=lambda name, default=None: default):
+        prompt = prompting.compose("Tweet: ", "@a @b hello https://t.co/xyz")
+
+    assert prompt == "Tweet: hello [link]"
+    after = prompting.stats()
+    assert after["prompts"] == before["prompts"] + 1
+    assert after["tokens_before"] - before["tokens_before"] > (
+        after["tokens_after"] - before["tokens_after"]
+    )
+
+
+def test_compose_truncates_to_budget():
+    with patch("utils.get_env_var", side_effect=lambda name, default=None: "20"), patch(
+        "builtins.print"
+    ):
+        prompt = prompting.compose("Tweet: ", "word " * 50)
+
+    assert prompt.startswith("Tweet: word")
+    assert prompt.endswith(" …")
+    assert prompting.estimate_tokens(prompt) <= 20
+
+
+def test_compose_refuses_prompt_without_room_for_tweet():
+    prefix = "Follow these instructions carefully. " * 4 + "Tweet: "
+    with patch("utils.get_env_var", side_effect=lambda name, default=None: "40"):
+        # Short tweets that fit are still sent
+        assert prompting.compose(prefix, "hi").endswith("Tweet: hi")
+        with pytest.raises(ValueError):
+            prompting.compose(prefix, "word " * 50)
+
+
+def test_compose_counts_system_text_towards_budget():
+    with patch("utils.get_env_var", side_effect=lambda name, default=None: "30"), patch(
+        "builtins.print"
+    ):
+        alone = prompting.compose("Tweet: ", "word " * 50)
+        with_system = prompting.compose("Tweet: ", "word " * 50, system="rules " * 8)
+
+    assert prompting.estimate_tokens(alone) <= 30
+    assert len(with_system) < len(alone)
+    assert prompting.estimate_tokens("rules " * 8 + with_system) <= 30
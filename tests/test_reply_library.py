@@ -0,0 +1,135 @@
+import json
+from pathlib import Path
+from unittest.mock import patch
+
+import reply_library
+import replier
+
+SEED = Path(__file__).resolve().parents[1] / "reply_library.json"
+
+
+THRESHOLD = replier.DEFAULT_LIBRARY_THRESHOLD
+
+
+def test_seed_library_matches_realistic_restatements():
+    library = reply_library.load_library(SEED)
+
+    for text, claim in (
+        ("@ReasonBot @someone The Earth is FLAT, wake up!", "the earth is flat"),
+        ("Earth is flat. Prove me wrong.", "the earth is flat"),
+        ("@ReasonBot the earth is flat, wake up sheeple", "the earth is flat"),
+        ("the earth is flat and NASA is lying to you", "the earth is flat"),
+        ("Vaccines cause autism, do your research", "vaccines cause autism"),
+        ("The moon landing was totally faked by Kubrick", "the moon landing was faked"),
+    ):
+        entry, score = library.match(text)
+        assert entry["claim"] == claim
+        assert score >= THRESHOLD, text
+
+
+def test_unrelated_or_negated_tweets_do_not_match():
+    library = reply_library.load_library(SEED)
+
+    for text in (
+        "Anyone who says the earth is flat is an idiot",
+        "Flat whites are the best drink on earth",
+        "My phone screen is flat and cracked",
+        "Can you explain why the earth is round?",
+        "I got my vaccines today, feeling fine",
+        "nice weather today",
+    ):
+        assert library.match(text)[1] < THRESHOLD, text
+        assert library.lookup(text, "calm", THRESHOLD) is None
+
+    for text in (
+        "the earth is not flat",
+        "The earth isn't flat",
+        "vaccines never cause autism",
+    ):
+        assert library.match(text) == (None, 0.0)
+
+
+def test_negated_claim_matches_only_negated_tweets():
+    library = reply_library.ReplyLibrary(
+        [{"claim": "birds aren't real", "replies": {"calm": "B"}}]
+    )
+    assert library.lookup("Birds aren\u2019t real", "calm", 0.75) == "B"
+    assert library.match("birds are real")[0] is None
+
+
+def test_lookup_prefers_reply_tone_then_default():
+    library = reply_library.ReplyLibrary(
+        [{"claim": "the earth is flat", "replies": {"calm": "C", "sarcastic": ["S"]}}]
+    )
+    assert library.lookup("the earth is flat", "sarcastic", 0.5) == "S"
+    assert library.lookup("the earth is flat", "firm", 0.5) == "C"
+
+
+def test_lookup_never_repeats_a_recent_variant(tmp_path):
+    """Duplicate mentions must not all get the same vetted text."""
+    library = reply_library.ReplyLibrary(
+        [
+            {
+                "claim": "the earth is flat",
+                "replies": {"sarcastic": "S", "calm": ["A", "B"]},
+            }
+        ]
+    )
+    served = reply_library.ServedReplies(tmp_path / "served.db", reuse_after=60)
+
+    with patch("reply_library.time.time", return_value=1000.0):
+        replies = [
+            library.lookup("the earth is flat", "sarcastic", 0.5, served)
+            for _ in range(4)
+        ]
+    # The requested tone first, then the default tone, then the LLM
+    assert replies[0] == "S"
+    assert sorted(replies[1:3]) == ["A", "B"]
+    assert replies[3] is None
+
+    # Another run sharing the table sees the same variants in use
+    other_run = reply_library.ServedReplies(tmp_path / "served.db", reuse_after=60)
+    with patch("reply_library.time.time", return_value=1030.0):
+        assert library.lookup("the earth is flat", "calm", 0.5, other_run) is None
+    with patch("reply_library.time.time", return_value=1061.0):
+        assert library.lookup("the earth is flat", "calm", 0.5, other_run) in {"A", "B"}
+
+
+def test_promote_reply_creates_and_merges(tmp_path):
+    path = tmp_path / "library.json"
+    reply_library.promote_reply(path, "Birds aren't real", "A")
+    reply_library.promote_reply(path, "birds aren't real", "B")
+    reply_library.promote_reply(path, "birds aren't real", "A")
+
+    entries = json.loads(path.read_text())
+    assert entries == [{"claim": "Birds aren't real", "replies": {"calm": ["A", "B"]}}]
+    assert reply_library.load_library(path).lookup(
+        "birds aren't real", "calm", 0.5
+    ) in {
+        "A",
+        "B",
+    }
+
+
+def test_generate_reply_serves_library_without_openai(tmp_path):
+    path = tmp_path / "library.json"
+    reply_library.promote_reply(path, "the earth is flat", "Vetted")
+
+    env = {"REPLY_LIBRARY_FILE": str(path)}
+    with patch("utils.load_env"), patch(
+        "utils.get_env_var",
+        side_effect=lambda name, default=None: env.get(name, default),
+    ), patch("replier.get_env_var", return_value="key"), patch(
+        "replier.openai.OpenAI"
+    ) as MockClient:
+        reply = replier.generate_reply({"reply_tone": "calm"}, "The earth is flat")
+        assert reply == "Vetted"
+        MockClient.assert_not_called()
+
+        # Slurs always get an LLM-written reply
+        replier.generate_reply({"contains_slur": True}, "The earth is flat")
+        MockClient.assert_called_once()
+
+        # The only variant was just served, so a duplicate mention goes to the LLM
+        replier.generate_reply({"reply_tone": "calm"}, "The earth is flat")
+        assert MockClient.call_count == 2
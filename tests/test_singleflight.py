@@ -0,0 +1,74 @@
+import threading
+import time
+
+import pytest
+
+import singleflight
+
+
+def _run_concurrently(n, target):
+    results = [None] * n
+    errors = [None] * n
+
+    def worker(i):
+        try:
+            results[i] = target()
+        except Exception as exc:
+            errors[i] = exc
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_callers_share_one_call():
+    group = singleflight.SingleFlight("t")
+    calls = []
+
+    def fn():
+        calls.append(1)
+        time.sleep(0.1)
+        return "reply"
+
+    results, errors = _run_concurrently(5, lambda: group.do("k", fn))
+
+    assert results == ["reply"] * 5
+    assert errors == [None] * 5
+    assert len(calls) == 1
+    assert group.stats() == {"calls": 1, "collapsed": 4, "failures": 0}
+
+
+def test_failed_leader_is_not_shared_with_followers():
+    group = singleflight.SingleFlight("t")
+    attempts = []
+    lock = threading.Lock()
+
+    def fn():
+        with lock:
+            attempts.append(1)
+            first = len(attempts) == 1
+        time.sleep(0.1)
+        if first:
+            raise RuntimeError("boom")
+        return "reply"
+
+    results, errors = _run_concurrently(4, lambda: group.do("k", fn))
+
+    # The leader sees its own error; followers retry and share a real reply
+    assert sum(isinstance(e, RuntimeError) for e in errors) == 1
+    assert results.count("reply") == 3
+    assert len(attempts) == 2
+    assert group.stats()["failures"] == 1
+
+
+def test_sequential_calls_are_not_cached():
+    group = singleflight.SingleFlight("t")
+    assert group.do("k", lambda: 1) == 1
+    assert group.do("k", lambda: 2) == 2
+
+    with pytest.raises(ValueError):
+        group.do("k", lambda: (_ for _ in ()).throw(ValueError("x")))
+    assert group.stats()["calls"] == 3
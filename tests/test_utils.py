@@ -24,3 +24,23 @@ def test_processed_id_helpers(tmp_path):
     utils.save_processed_id(file, "2")
     ids = utils.load_processed_ids(file)
     assert ids == {"1", "2"}
+
+
+def test_normalize_text_ignores_handles_urls_and_case():
+    a = "@ReasonBot @alice The earth   is FLAT https://t.co/abc"
+    b = "@reasonbot @bob the earth is flat"
+    assert utils.normalize_text(a) == utils.normalize_text(b) == "the earth is flat"
+
+
+def test_deadline_remaining_and_timeout():
+    with patch("utils.time.monotonic", side_effect=[100.0, 104.0, 104.0, 111.0]):
+        deadline = utils.Deadline(10)
+        assert deadline.remaining() == 6.0
+        assert deadline.timeout(2.0) == 4.0
+        assert deadline.expired() is True
+
+
+def test_deadline_left_handles_no_deadline():
+    assert utils.Deadline.left(None) is None
+    with patch("utils.time.monotonic", side_effect=[100.0, 103.0]):
+        assert utils.Deadline.left(utils.Deadline(10)) == 7.0
@@ -7,6 +7,7 @@ and error resilience. Shared tools across all modules.
 from __future__ import annotations
 
 import os
+import re
 import time
 from pathlib import Path
 from typing import Set
@@ -19,10 +20,15 @@ __all__ = [
     "is_rate_limited",
     "load_processed_ids",
     "save_processed_id",
+    "normalize_text",
+    "Deadline",
 ]
 
 _ENV_LOADED = False
 
+_HANDLE_RE = re.compile(r"@\w+")
+_URL_RE = re.compile(r"https?://\S+")
+
 
 def load_env() -> None:
     """Load environment variables from a ``.env`` file once."""
@@ -110,3 +116,48 @@ def save_processed_id(path: Path, tweet_id: str) -> None:
             fh.write(f"{tweet_id}\n")
     except Exception:
         pass
+
+
+def normalize_text(text: str) -> str:
+    """Return a canonical form of ``text`` for detecting duplicate tweets.
+
+    Handles and URLs are dropped, case is folded and whitespace collapsed, so
+    copies of the same message from different accounts compare equal.
+    """
+
+    text = _URL_RE.sub(" ", _HANDLE_RE.sub(" ", text))
+    return " ".join(text.lower().split())
+
+
+class Deadline:
+    """Wall-clock budget for a run, measured on the monotonic clock.
+
+    Parameters
+    ----------
+    seconds:
+        Time available from construction until the deadline.
+    """
+
+    def __init__(self, seconds: float) -> None:
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline, never negative."""
+
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        """``True`` once the deadline has passed."""
+
+        return self.remaining() <= 0.0
+
+    @staticmethod
+    def left(deadline: Deadline | None) -> float | None:
+        """Seconds left on ``deadline``, or ``None`` when there is no deadline."""
+
+        return None if deadline is None else deadline.remaining()
+
+    def timeout(self, reserve: float = 0.0) -> float:
+        """Remaining seconds minus ``reserve``, for use as a call timeout."""
+
+        return max(self.remaining() - reserve, 0.0)